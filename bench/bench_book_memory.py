@@ -0,0 +1,62 @@
+# Отчёт tracemalloc о памяти, занимаемой каталогом при разных способах хранения книг.
+# Запуск из корня проекта: python -m bench.bench_book_memory [количество книг]
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from bench.catalog import synthetic_books
+from library_manage import Book, BookTable, write_json_books
+
+DEFAULT_SIZE = 200_000  # Размер каталога по умолчанию.
+
+
+class DictBook:
+    """
+        Класс DictBook повторяет прежнее устройство Book: атрибуты в __dict__, строки не интернированы.
+    """
+    def __init__(self, book_id, title, author, year, status="В наличии"):
+        self.book_id = book_id
+        self.title = title
+        self.author = author
+        self.year = year
+        self.status = status
+
+
+# Функция для чтения словарей книг из файла, записанного write_json_books (одна книга на строку).
+def read_records(filename):
+    with open(filename, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip().rstrip(',')
+            if line.startswith('{'):
+                yield json.loads(line)
+
+
+# Способы хранения каталога: словарь "ID -> книга" или таблица по столбцам.
+LAYOUTS = {
+    'Book с __dict__ (до)': lambda records: {record['book_id']: DictBook(**record) for record in records},
+    'Book с __slots__ и интернированием': lambda records: {record['book_id']: Book(**record) for record in records},
+    'BookTable (по столбцам)': lambda records: BookTable(Book(**record) for record in records),
+}
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'library.json')
+        with open(filename, 'w', encoding='utf-8') as file:
+            write_json_books(file, synthetic_books(size))
+
+        print(f"{'Способ хранения':<40} {'МБ':>8} {'байт на книгу':>15}")
+        for name, build in LAYOUTS.items():
+            tracemalloc.start()
+            catalog = build(read_records(filename))
+            current = tracemalloc.get_traced_memory()[0]  # Память, занятая построенным каталогом.
+            tracemalloc.stop()
+            print(f'{name:<40} {current / 1024 / 1024:>8.1f} {current / len(catalog):>15.0f}')
+            del catalog
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# Бенчмарк индекса по ID: время get_book, update_status и remove_book на каталогах разного размера.
+# Запуск из корня проекта: python -m bench.bench_index
+import contextlib
+import io
+import random
+import time
+
+from library_manage import Library, Book
+
+SIZES = [10_000, 100_000, 1_000_000]  # Размеры каталогов.
+OPERATIONS = 10_000  # Количество операций каждого вида.
+
+
+# Функция для создания библиотеки с n синтетическими книгами без записи на диск.
+def make_library(n):
+    library = Library('bench_library.json')
+    library._commit = lambda record: None  # Сохранение отключено, измеряется только работа с памятью.
+    library.books = (Book(str(i), f'Книга {i}', f'Автор {i % 1000}', str(1900 + i % 125)) for i in range(n))
+    return library
+
+
+# Функция для измерения среднего времени одной операции в микросекундах.
+def measure(operation, ids):
+    with contextlib.redirect_stdout(io.StringIO()):  # Сообщения методов не выводятся.
+        start = time.perf_counter()
+        for book_id in ids:
+            operation(book_id)
+        elapsed = time.perf_counter() - start
+    return elapsed / len(ids) * 1_000_000
+
+
+def main():
+    print(f"{'Книг':>10} {'get_book, мкс':>15} {'update_status, мкс':>20} {'remove_book, мкс':>18}")
+    for n in SIZES:
+        library = make_library(n)
+        ids = random.Random(n).sample(range(n), OPERATIONS)
+        ids = [str(i) for i in ids]
+        get_time = measure(library.get_book, ids)
+        update_time = measure(lambda book_id: library.update_status(book_id, 'Выдана'), ids)
+        remove_time = measure(library.remove_book, ids)
+        print(f'{n:>10} {get_time:>15.2f} {update_time:>20.2f} {remove_time:>18.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# Бенчмарк пиковой памяти при загрузке большого JSON файла библиотеки.
+# Каждый режим запускается в отдельном процессе, чтобы измерить его пиковое потребление памяти.
+# Запуск из корня проекта: python -m bench.bench_memory [количество книг]
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from library_fill import fill
+from library_manage import Library, Book
+
+DEFAULT_SIZE = 2_000_000  # Размер каталога по умолчанию.
+MODES = {
+    'json.load': 'полная загрузка через json.load',
+    'eager': 'Library(filename) с потоковым чтением',
+    'lazy': 'Library(filename, lazy=True), поиск и перебор',
+}
+
+
+# Функция, выполняющая один режим загрузки в дочернем процессе.
+def run_mode(mode, filename):
+    start = time.perf_counter()
+    if mode == 'json.load':
+        with open(filename, 'r', encoding='utf-8') as file:
+            books = [Book(**book) for book in json.load(file)]
+        count = len(books)
+    elif mode == 'eager':
+        count = len(Library(filename))
+    else:
+        library = Library(filename, lazy=True)
+        library.search('author', 'беспалов', limit=20)
+        count = sum(1 for _ in library.iter_books())
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Пиковая память в МБ (Linux).
+    print(json.dumps({'mode': mode, 'books': count, 'seconds': round(elapsed, 2), 'peak_mb': round(peak)}))
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '--mode':
+        run_mode(sys.argv[2], sys.argv[3])
+        return
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE
+    filename = f'bench_library_{size}.json'
+    if not os.path.exists(filename):
+        print(f'Создание файла {filename} с {size} книгами через library_fill.py...')
+        fill(size, filename, workers=os.cpu_count())
+    print(f'Размер файла: {os.path.getsize(filename) / 1024 / 1024:.0f} МБ\n')
+    print(f"{'Режим':<45} {'Книг':>10} {'Время, с':>10} {'Пик памяти, МБ':>16}")
+    for mode, description in MODES.items():
+        output = subprocess.run([sys.executable, '-m', 'bench.bench_memory', '--mode', mode, filename],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output)
+        print(f"{description:<45} {result['books']:>10} {result['seconds']:>10} {result['peak_mb']:>16}")
+
+
+if __name__ == '__main__':
+    main()
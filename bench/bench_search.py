@@ -0,0 +1,49 @@
+# Бенчмарк поиска по инвертированному индексу названий и авторов и по индексу года издания.
+# Запуск из корня проекта: python -m bench.bench_search
+import time
+
+from bench.catalog import synthetic_books
+from library_manage import Library
+
+SIZE = 1_000_000  # Размер каталога.
+QUERIES = [
+    ('title', 'Амортизированная'),
+    ('title', 'направ реализ'),
+    ('title', 'интерфейс'),
+    ('author', 'Беспалов'),
+    ('author', 'анна иван'),
+    ('author', 'а'),
+]
+YEAR_RANGES = [(1990, None), (1950, 1959), (1900, 2024)]  # Диапазоны для books_by_year.
+
+
+def main():
+    library = Library('bench_library.json')
+    start = time.perf_counter()
+    library.books = synthetic_books(SIZE)
+    print(f'Создание каталога и индекса по году для {SIZE} книг: {time.perf_counter() - start:.2f} с')
+
+    start = time.perf_counter()
+    library.search('title', 'построение индекса')
+    print(f'Построение индекса для {SIZE} книг: {time.perf_counter() - start:.2f} с\n')
+
+    print(f"{'Поле':<8} {'Запрос':<20} {'Найдено':>8} {'мс (limit=20)':>14} {'мс (все)':>10}")
+    for field, query in QUERIES:
+        start = time.perf_counter()
+        library.search(field, query, limit=20)
+        limited_time = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        found = len(library.search(field, query))
+        full_time = (time.perf_counter() - start) * 1000
+        print(f'{field:<8} {query:<20} {found:>8} {limited_time:>14.3f} {full_time:>10.3f}')
+
+    print(f"\n{'Годы':<20} {'Найдено':>8} {'мс':>10}")
+    for first, last in YEAR_RANGES:
+        start = time.perf_counter()
+        found = len(library.books_by_year(first, last))
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{f'{first}-{last or first}':<20} {found:>8} {elapsed:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+# Генерация синтетических каталогов для бенчмарков.
+import random
+
+from faker import Faker
+
+from library_manage import Book
+
+POOL_SIZE = 20_000  # Количество уникальных названий и авторов, из которых собирается каталог.
+
+
+# Функция для создания n книг с реалистичными названиями и авторами.
+# Faker вызывается только для пула значений, поэтому каталог на миллион книг создаётся за секунды.
+def synthetic_books(n, seed=0):
+    fake = Faker('ru-RU')
+    fake.seed_instance(seed)
+    titles = [fake.catch_phrase() for _ in range(min(n, POOL_SIZE))]
+    authors = [fake.name() for _ in range(min(n, POOL_SIZE))]
+    rng = random.Random(seed)
+    for i in range(n):
+        yield Book(str(i), rng.choice(titles), rng.choice(authors), str(rng.randint(1900, 2024)))
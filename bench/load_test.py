@@ -0,0 +1,166 @@
+# Нагрузочный тест HTTP сервиса библиотеки смешанным потоком чтений и изменений.
+# Выводит пропускную способность и задержки p50/p99 для каждого вида запросов.
+# Если адрес сервиса не указан, сервис запускается в отдельном процессе на временном каталоге.
+# Запуск из корня проекта:
+#   python -m bench.load_test --books 100000 --connections 32 --requests 20000 --write-ratio 0.2
+#   python -m bench.load_test --port 8080   (уже запущенный сервис)
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.catalog import synthetic_books
+from library_manage import write_json_books
+from library_server import request
+
+READ_MIX = (('get', 3), ('search', 2), ('list', 1))  # Виды чтений и их веса.
+WRITE_MIX = (('status', 3), ('add', 1), ('remove', 1))  # Виды изменений и их веса.
+
+
+# Функция для получения процентиля из отсортированного списка задержек.
+def percentile(latencies, fraction):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+# Функция для выбора вида запроса с учётом весов.
+def choose(rng, mix):
+    return rng.choices([name for name, weight in mix], [weight for name, weight in mix])[0]
+
+
+# Функция одного клиента: отправляет запросы по одному соединению, пока не исчерпан общий счётчик запросов.
+async def client(number, host, port, book_ids, words, remaining, write_ratio, latencies):
+    rng = random.Random(number)
+    reader, writer = await asyncio.open_connection(host, port)
+    added = []  # Книги, добавленные этим клиентом, которые можно удалить.
+    try:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            kind = choose(rng, WRITE_MIX if rng.random() < write_ratio else READ_MIX)
+            if kind == 'remove' and not added:
+                kind = 'add'
+            if kind == 'get':
+                args = ('GET', f'/books/{rng.choice(book_ids)}')
+            elif kind == 'search':
+                args = ('GET', f'/search?field=title&q={rng.choice(words)}&limit=20')
+            elif kind == 'list':
+                args = ('GET', f'/books?page={rng.randint(1, 50)}')
+            elif kind == 'status':
+                args = ('PUT', f'/books/{rng.choice(book_ids)}/status',
+                        {'status': rng.choice(['В наличии', 'Выдана'])})
+            elif kind == 'add':
+                book_id = f'load-{number}-{remaining[0]}'
+                added.append(book_id)
+                args = ('POST', '/books',
+                        {'book_id': book_id, 'title': f'Книга {book_id}', 'author': 'Нагрузочный Тест', 'year': '2024'})
+            else:
+                args = ('DELETE', f'/books/{added.pop()}')
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, *args)
+            latencies.setdefault(kind, []).append(time.perf_counter() - start)
+            if status >= 500:
+                raise RuntimeError(f"Сервис вернул ошибку {status} на запрос {args[:2]}")
+    finally:
+        writer.close()
+
+
+# Функция для выполнения нагрузочного теста. Возвращает задержки по видам запросов и общее время.
+async def run_load(host, port, book_ids, words, connections, requests, write_ratio):
+    latencies = {}
+    remaining = [requests]  # Общий счётчик оставшихся запросов для всех клиентов.
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number, host, port, book_ids, words, remaining, write_ratio, latencies)
+                           for number in range(connections)))
+    return latencies, time.perf_counter() - start
+
+
+# Функция для получения ID книг и слов для поисковых запросов из первых страниц каталога сервиса.
+async def sample_catalog(host, port, pages=10):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        books = []
+        for page in range(1, pages + 1):
+            status, payload = await request(reader, writer, 'GET', f'/books?page={page}&page_size=100')
+            books.extend(payload.get('books', []))
+    finally:
+        writer.close()
+    if not books:
+        raise RuntimeError("Каталог сервиса пуст")
+    words = sorted({word for book in books for word in str(book['title']).split()})
+    return [book['book_id'] for book in books], words
+
+
+# Функция для получения свободного порта.
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# Функция для запуска сервиса в отдельном процессе и ожидания готовности.
+def start_server(path, port):
+    process = subprocess.Popen([sys.executable, 'library_server.py', '--port', str(port), '--path', path],
+                               stdout=subprocess.DEVNULL)
+    for _ in range(600):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("Сервис завершился при запуске")
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Сервис не запустился")
+
+
+# Функция для вывода отчёта.
+def report(latencies, seconds):
+    total = sum(len(values) for values in latencies.values())
+    print(f"\nЗапросов: {total}, время: {seconds:.2f} с, пропускная способность: {total / seconds:.0f} запр/с\n")
+    print(f"{'Запрос':<10} {'кол-во':>8} {'p50, мс':>10} {'p99, мс':>10}")
+    everything = []
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        everything.extend(values)
+        print(f"{kind:<10} {len(values):>8} {percentile(values, 0.5) * 1000:>10.2f} {percentile(values, 0.99) * 1000:>10.2f}")
+    everything.sort()
+    print(f"{'все':<10} {len(everything):>8} {percentile(everything, 0.5) * 1000:>10.2f} "
+          f"{percentile(everything, 0.99) * 1000:>10.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Нагрузочный тест HTTP сервиса библиотеки.')
+    parser.add_argument('--host', default='127.0.0.1', help='адрес уже запущенного сервиса')
+    parser.add_argument('--port', type=int, help='порт уже запущенного сервиса; без него сервис запускается')
+    parser.add_argument('--books', type=int, default=100_000, help='размер каталога для запускаемого сервиса')
+    parser.add_argument('--connections', type=int, default=32, help='количество одновременных соединений')
+    parser.add_argument('--requests', type=int, default=20_000, help='общее количество запросов')
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='доля изменений среди запросов')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        process = None
+        port = args.port
+        if port is None:
+            path = os.path.join(directory, 'library.json')
+            with open(path, 'w', encoding='utf-8') as file:
+                write_json_books(file, synthetic_books(args.books))
+            port = free_port()
+            process = start_server(path, port)
+        try:
+            book_ids, words = asyncio.run(sample_catalog(args.host, port))
+            latencies, seconds = asyncio.run(run_load(args.host, port, book_ids, words, args.connections,
+                                                      args.requests, args.write_ratio))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+    report(latencies, seconds)
+
+
+if __name__ == '__main__':
+    main()
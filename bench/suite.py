@@ -0,0 +1,182 @@
+# Набор бенчмарков всех операций Library на каталогах разного размера.
+# Результаты записываются в JSON файл, который можно сравнить с результатами другого коммита.
+# Запуск из корня проекта:
+#   python -m bench.suite --sizes 1000,100000,1000000 --output bench_results.json
+#   python -m bench.suite --sizes 1000 --compare bench_results.json
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from unittest import mock
+
+from bench.catalog import synthetic_books
+from library_manage import Library, Book, DEFAULT_PAGE_SIZE, write_json_books
+
+DEFAULT_SIZES = '1000,100000,1000000'  # Размеры каталогов по умолчанию.
+DEFAULT_BACKENDS = 'journal,sqlite'  # Конфигурации библиотеки по умолчанию.
+REGRESSION_RATIO = 1.2  # Во сколько раз операция должна замедлиться, чтобы считаться регрессией.
+
+
+# Функция для создания библиотеки в нужной конфигурации.
+def open_library(backend, path):
+    if backend == 'json':
+        return Library(path)
+    if backend == 'journal':
+        return Library(path, journal=True)
+    if backend == 'columnar':
+        return Library(path, journal=True, columnar=True)
+    if backend == 'lazy':
+        return Library(path, lazy=True)
+    return Library(path, backend='sqlite')
+
+
+# Функция для создания файла библиотеки с n книгами.
+def create_catalog(backend, path, size):
+    if backend == 'sqlite':
+        library = Library(path, backend='sqlite')
+        library.books = synthetic_books(size)
+        library.close()
+    else:
+        with open(path, 'w', encoding='utf-8') as file:
+            write_json_books(file, synthetic_books(size))
+
+
+# Функция для измерения времени вызова. Вывод методов библиотеки подавляется.
+def timed(function, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = function(*args)
+        return time.perf_counter() - start, result
+
+
+# Функция для вызова интерактивного метода с заранее заданным вводом пользователя.
+def with_input(function, *answers):
+    answers = iter(answers)
+    with mock.patch.object(builtins, 'input', lambda prompt='': next(answers)):
+        return function()
+
+
+# Функция для выполнения всех операций над одним каталогом. Возвращает список результатов.
+def run_case(backend, size, operations, directory):
+    path = os.path.join(directory, f'library_{size}.db' if backend == 'sqlite' else f'library_{size}.json')
+    create_catalog(backend, path, size)
+    results = []
+
+    def record(operation, seconds, count=1):
+        results.append({'backend': backend, 'size': size, 'operation': operation, 'count': count,
+                        'seconds': round(seconds, 6), 'per_op_us': round(seconds / count * 1_000_000, 2)})
+
+    seconds, library = timed(open_library, backend, path)
+    record('open', seconds)
+    seconds, _ = timed(library.load_books)
+    record('load_books', seconds)
+
+    # Запросы берутся из существующих книг, чтобы поиск находил результаты.
+    sample = next(book for number, book in enumerate(library.iter_books()) if number == size // 2)
+    title_query = sample.title.split()[0]
+    author_query = sample.author.split()[0]
+    # Поисковый индекс строится при первом поиске, его построение измеряется отдельно.
+    seconds, _ = timed(library.search, 'title', title_query)
+    record('build_search_index', seconds)
+    for mode, term in (('1', title_query), ('2', author_query), ('3', str(sample.year))):
+        seconds, found = timed(with_input, library.find_book, mode, term)
+        record(f'find_book[{mode}]', seconds)
+    # Поиск с опечаткой: из фамилии автора удаляется одна буква. Триграммный индекс строится при первом вызове.
+    typo = author_query[:2] + author_query[3:]
+    seconds, _ = timed(library.fuzzy_search, 'author', 'x')
+    record('build_fuzzy', seconds)
+    seconds, _ = timed(library.fuzzy_search, 'author', typo)
+    record('fuzzy_search', seconds)
+    # Отображение первой и последней страницы каталога, включая отрисовку таблицы.
+    for name, page in (('display_books[first]', 1), ('display_books[last]', (size - 1) // DEFAULT_PAGE_SIZE + 1)):
+        seconds, table = timed(library.display_books, page)
+        render_seconds, _ = timed(str, table)
+        record(name, seconds + render_seconds)
+
+    # Полное сохранение JSON файла выполняется при каждом изменении, поэтому для него операций меньше.
+    count = min(operations, 5) if backend == 'json' else operations
+    ids = [str(book_id) for book_id in random.Random(size).sample(range(size), min(count, size))]
+    seconds, _ = timed(lambda: [library.update_status(book_id, 'Выдана') for book_id in ids])
+    record('update_status', seconds, len(ids))
+    seconds, _ = timed(lambda: [library.remove_book(book_id) for book_id in ids])
+    record('remove_book', seconds, len(ids))
+    new_books = [Book(f'new-{i}', f'Новая книга {i}', 'Новый Автор', '2024') for i in range(len(ids))]
+    seconds, _ = timed(lambda: [library.add_book(book.book_id, book.title, book.author, book.year)
+                                for book in new_books])
+    record('add_book', seconds, len(new_books))
+    seconds, _ = timed(library.save_books)
+    record('save_books', seconds)
+    library.close()
+    return results
+
+
+# Функция для получения текущего коммита, если бенчмарк запущен в git репозитории.
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Функция для вывода сравнения с результатами предыдущего запуска.
+def compare(results, baseline_filename):
+    with open(baseline_filename, 'r', encoding='utf-8') as file:
+        baseline = {(result['backend'], result['size'], result['operation']): result
+                    for result in json.load(file)['results']}
+    print(f"\n{'Бэкенд':<10} {'Книг':>9} {'Операция':<16} {'было, мкс':>14} {'стало, мкс':>14} {'отношение':>10}")
+    regressions = 0
+    for result in results:
+        old = baseline.get((result['backend'], result['size'], result['operation']))
+        if old is None or not old['per_op_us']:
+            continue
+        ratio = result['per_op_us'] / old['per_op_us']
+        mark = '  регрессия' if ratio > REGRESSION_RATIO else ''
+        regressions += bool(mark)
+        print(f"{result['backend']:<10} {result['size']:>9} {result['operation']:<16} "
+              f"{old['per_op_us']:>14.2f} {result['per_op_us']:>14.2f} {ratio:>10.2f}{mark}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарки операций библиотеки.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='размеры каталогов через запятую')
+    parser.add_argument('--backends', default=DEFAULT_BACKENDS,
+                        help='конфигурации через запятую: json, journal, columnar, lazy, sqlite')
+    parser.add_argument('--operations', type=int, default=1000, help='количество изменений каждого вида')
+    parser.add_argument('--output', default='bench_results.json', help='файл для результатов в формате JSON')
+    parser.add_argument('--compare', metavar='FILE', help='результаты предыдущего запуска для сравнения')
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backends.split(','):
+            for size in map(int, args.sizes.split(',')):
+                case = run_case(backend, size, args.operations, directory)
+                for result in case:
+                    print(f"{result['backend']:<10} {result['size']:>9} {result['operation']:<16} "
+                          f"{result['seconds']:>12.6f} с {result['per_op_us']:>14.2f} мкс/оп")
+                results.extend(case)
+
+    report = {
+        'meta': {'commit': current_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+                 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'operations': args.operations},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=4)
+    print(f'\nРезультаты записаны в {args.output}')
+    if args.compare:
+        regressions = compare(results, args.compare)
+        print(f'\nРегрессий: {regressions}')
+
+
+if __name__ == '__main__':
+    main()
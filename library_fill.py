@@ -1,25 +1,92 @@
-import uuid
+import argparse
+import collections
 import json
+import multiprocessing
+import os
 
 from faker import Faker
 
-fake = Faker('ru-RU')
+from library_manage import Library, Book, write_json_books
 
-library_list = []  # Создание списка для хранения данных.
+CHUNK_SIZE = 10_000  # Количество книг, создаваемых за одну задачу.
+OUTPUT_FILES = {'json': 'library.json', 'jsonl': 'library.jsonl', 'sqlite': 'library.db'}  # Файлы по умолчанию.
 
-for i in range(10):  # Чем больше число - тем больше книг будет создано.
-    # Создание словаря для хранения каждой отдельно взятой книги.
-    book_dict = {
-            'book_id': str(uuid.uuid4()),
+fake = None  # Генератор Faker, создаётся один раз в каждом процессе.
+
+
+# Функция для создания части каталога с номером index.
+# Генератор инициализируется отдельным зерном для каждой части, поэтому результат
+# зависит только от seed и не зависит от количества процессов и порядка выполнения задач.
+def generate_chunk(seed, index, count):
+    global fake
+    if fake is None:
+        fake = Faker('ru-RU')
+    fake.seed_instance(f'{seed}-{index}')
+
+    library_list = []  # Создание списка для хранения данных.
+    for i in range(count):
+        # Создание словаря для хранения каждой отдельно взятой книги.
+        book_dict = {
+            'book_id': fake.uuid4(),
             'title': fake.catch_phrase(),
             'author': fake.name(),
             'year': fake.year(),
             'status': 'В наличии'
-    }
+        }
+        # Добавление словаря с данными книги в список.
+        library_list.append(book_dict)
+    return library_list
+
+
+# Функция для получения частей каталога по порядку.
+# Одновременно выполняется не больше workers * 2 задач, поэтому объём памяти не зависит от размера каталога.
+def generate_chunks(count, workers, seed):
+    sizes = [min(CHUNK_SIZE, count - start) for start in range(0, count, CHUNK_SIZE)]
+    if workers == 1:
+        for index, size in enumerate(sizes):
+            yield generate_chunk(seed, index, size)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        pending = collections.deque()
+        for index, size in enumerate(sizes):
+            pending.append(pool.apply_async(generate_chunk, (seed, index, size)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+# Функция для создания файла библиотеки с count книгами в формате json, jsonl или sqlite.
+def fill(count, output, file_format='json', workers=1, seed=0):
+    chunks = generate_chunks(count, workers, seed)
+    if file_format == 'sqlite':
+        library = Library(output, backend='sqlite')
+        with library.batch():  # Все книги добавляются одной транзакцией.
+            for chunk in chunks:
+                library.add_books(chunk)
+        library.close()
+        return
+    with open(output, 'w', encoding='utf-8') as file:
+        if file_format == 'json':
+            # Запись данных книг в файл в формате JSON по мере создания частей каталога.
+            write_json_books(file, (Book(**book) for chunk in chunks for book in chunk))
+        else:
+            for chunk in chunks:
+                file.write(''.join(json.dumps(book, ensure_ascii=False) + '\n' for book in chunk))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Создание файла библиотеки со случайными книгами.')
+    parser.add_argument('--count', type=int, default=10, help='количество книг (по умолчанию 10)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='количество процессов')
+    parser.add_argument('--seed', type=int, default=0, help='зерно генератора для воспроизводимого результата')
+    parser.add_argument('--format', dest='file_format', choices=OUTPUT_FILES, default='json', help='формат файла')
+    parser.add_argument('--output', help='имя файла (по умолчанию library.json, library.jsonl или library.db)')
+    args = parser.parse_args(argv)
+    if args.count < 0 or args.workers < 1:
+        parser.error('количество книг не может быть отрицательным, а процессов должно быть не меньше одного')
+    fill(args.count, args.output or OUTPUT_FILES[args.file_format], args.file_format, args.workers, args.seed)
 
-    # Добавление словаря с данными книги в список.
-    library_list.append(book_dict)
 
-with open('library.json', 'w', encoding='utf-8') as file:
-    # Запись списка с данными книг в файл в формате JSON.
-    json.dump(library_list, file, ensure_ascii=False, indent=4)
+if __name__ == '__main__':
+    main()
@@ -1,62 +1,1630 @@
+import argparse
+import bisect
+import contextlib
+import cProfile
+import csv
+import functools
+import heapq
+import itertools
 import json
+import mmap
+import operator
+import os
+import pstats
+import re
+import sqlite3
+import struct
+import sys
+import time
 import uuid
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from collections.abc import MutableMapping
 
 from prettytable import PrettyTable
 
+try:
+    import fcntl
+except ImportError:  # На Windows модуль fcntl недоступен, и блокировка файла между процессами не выполняется.
+    fcntl = None
+
+
+BOOK_FIELDS = ('book_id', 'title', 'author', 'year', 'status')  # Поля книги в порядке записи в JSON.
+TABLE_FIELDS = ["ID", "Название книги", "Автор", "Год издания", "Статус"]  # Заголовки столбцов таблицы книг.
+DEFAULT_PAGE_SIZE = 20  # Количество книг на странице при выводе в консоль.
+SEARCH_FIELDS = ('title', 'author')  # Поля книги, по которым строится поисковый индекс.
+SEARCH_CACHE_SIZE = 1024  # Количество запросов, результаты которых хранятся в кэше поиска.
+SEARCH_CACHE_MAX_RESULTS = 10_000  # Результаты длиннее этого числа книг в кэш не попадают.
+SNAPSHOT_EXTENSION = '.lbs'  # Расширение файла двоичного снимка библиотеки.
+SNAPSHOT_MAGIC = b'LIBSNAP\x00'  # Сигнатура в начале двоичного снимка.
+SNAPSHOT_VERSION = 1  # Версия формата двоичного снимка.
+# Заголовок снимка: сигнатура, версия, порядок байтов, количество книг, строк и ячеек индекса,
+# смещения записей книг, индекса, смещений строк и видов строк.
+SNAPSHOT_HEADER = struct.Struct('<8sHB5xQQQQQQQ')
+SNAPSHOT_STRING, SNAPSHOT_JSON = 0, 1  # Виды строк снимка: текст в UTF-8 или значение в формате JSON.
+SNAPSHOT_EMPTY = 0xFFFFFFFF  # Свободная ячейка хэш-индекса снимка.
+STATUS_AVAILABLE = 'В наличии'  # Статус книги, которая находится в библиотеке.
+STATUS_ISSUED = 'Выдана'  # Статус книги, выданной читателю.
+FUZZY_SEARCH_LIMIT = 20  # Количество книг в результатах нечёткого поиска по умолчанию.
+FUZZY_CANDIDATES = 100  # Сколько похожих по триграммам слов проверяется расстоянием Левенштейна.
+METRICS_DUMP_INTERVAL = 60.0  # Минимальный интервал между записями снимков метрик в файл, в секундах.
+PROFILE_REPORT_LINES = 20  # Количество функций в отчёте профилировщика.
+# Методы библиотеки, вызовы которых измеряются при включённых метриках.
+METRIC_METHODS = (
+    'add_book', 'remove_book', 'update_status', 'find_book', 'display_books', 'get_book', 'search', 'books_by_year',
+    'fuzzy_search', 'books_with_status', 'status_counts', 'add_books', 'remove_books', 'update_statuses', 'import_books',
+    'export_books', 'load_books', 'save_books', 'compact', 'refresh', '_search', '_write_records', '_write_snapshot',
+)
+TOKEN_PATTERN = re.compile(r'\w+')  # Шаблон слова для разбиения текста на токены.
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')  # Пробельные символы между элементами JSON.
+# Токенизатор FTS5, разбивающий текст на слова так же, как TOKEN_PATTERN: буквы с диакритикой
+# сохраняются, а подчёркивание считается частью слова.
+FTS_TOKENIZER = "unicode61 remove_diacritics 0 tokenchars '_'"
+
+
+# Функция для нормализации текста: приведение к нижнему регистру с учётом кириллицы и замена "ё" на "е".
+def normalize(text):
+    return str(text).casefold().replace('ё', 'е')
+
+
+# Функция для разбиения текста на нормализованные токены.
+def tokenize(text):
+    return TOKEN_PATTERN.findall(normalize(text))
+
+
+# Функция для получения множества триграмм слова. Слово дополняется пробелами, чтобы начало
+# и конец слова давали отдельные триграммы и совпадение первых букв весило больше.
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Функция для вычисления расстояния Левенштейна между словами с ограничением bound.
+# Возвращает None, как только становится ясно, что расстояние больше bound.
+def bounded_levenshtein(first, second, bound):
+    if abs(len(first) - len(second)) > bound:
+        return None
+    if first == second:
+        return 0
+    previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i]
+        for j, second_char in enumerate(second, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (first_char != second_char)))
+        if min(current) > bound:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= bound else None
+
+
+# Функция для определения допустимого числа опечаток в слове запроса по его длине.
+def fuzzy_distance(word):
+    if len(word) <= 2:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+# Функция для ранжирования книг по найденным для каждого слова запроса похожим словам.
+# matches - списки (расстояние, -сходство, слово) для каждого слова запроса, лучшие первыми;
+# postings - функция, возвращающая словарь "ID книги -> позиция в каталоге" для книг, в поле которых есть слово;
+# книги в словаре упорядочены по позиции.
+# Книга подходит, если для каждого слова запроса в ней есть похожее слово; книги упорядочиваются
+# по сумме расстояний, при равных расстояниях - по сумме сходства по Жаккару, а затем по порядку каталога.
+# Возвращает ID книг.
+def rank_fuzzy_matches(matches, postings, limit=None):
+    if len(matches) == 1:
+        # Для одного слова книги перебираются группами слов с одинаковой оценкой до достижения лимита,
+        # внутри группы - в порядке каталога.
+        results = []
+        seen = set()
+        for score, group in itertools.groupby(matches[0], key=operator.itemgetter(0, 1)):
+            lists = [postings(word).items() for distance, similarity, word in group]
+            for book_id, position in lists[0] if len(lists) == 1 else heapq.merge(*lists, key=operator.itemgetter(1)):
+                if book_id not in seen:
+                    seen.add(book_id)
+                    results.append(book_id)
+                    if len(results) == limit:
+                        return results
+        return results
+    # Слова запроса обрабатываются от самого редкого к самому частому.
+    sizes = [sum(len(postings(word)) for distance, similarity, word in word_matches) for word_matches in matches]
+    scores = None  # ID книги -> (сумма расстояний, сумма сходства с обратным знаком).
+    positions = {}  # ID книги -> позиция в каталоге.
+    for size, word_matches in sorted(zip(sizes, matches), key=lambda item: item[0]):
+        best = {}
+        if scores is not None and len(scores) * len(word_matches) <= size:
+            # Кандидатов мало - каждый проверяется по словарям книг похожих слов.
+            for book_id in scores:
+                for distance, similarity, word in word_matches:
+                    if book_id in postings(word):
+                        best[book_id] = (distance, similarity)
+                        break
+        else:
+            for distance, similarity, word in word_matches:
+                for book_id, position in postings(word).items():
+                    if book_id not in best and (scores is None or book_id in scores):
+                        best[book_id] = (distance, similarity)
+                        positions[book_id] = position
+        if scores is None:
+            scores = best
+        else:
+            scores = {book_id: (scores[book_id][0] + distance, scores[book_id][1] + similarity)
+                      for book_id, (distance, similarity) in best.items()}
+        if not scores:
+            return []
+    return sorted(scores, key=lambda book_id: (scores[book_id], positions[book_id]))[:limit]
+
+
+# Функция для интернирования строки: одинаковые значения (статусы, авторы, годы) хранятся в памяти один раз.
+def intern_string(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+# Функция для преобразования года издания в число. Возвращает None, если год указан некорректно.
+def parse_year(year):
+    try:
+        return int(year)
+    except (TypeError, ValueError):
+        return None
+
+
+# Функция для потокового чтения JSON массива книг из файла.
+# Элементы массива разбираются по одному, поэтому в памяти находится только текущий фрагмент файла.
+def iter_json_books(file, chunk_size=1 << 16):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    # Что ожидается дальше: '[' - начало массива, 'first' - первый элемент или ']',
+    # 'item' - элемент после запятой, ',' - запятая или ']', 'end' - только пробелы до конца файла.
+    expected = '['
+    eof = False
+    while True:
+        position = JSON_WHITESPACE.match(buffer, position).end()  # Пропуск пробелов между элементами массива.
+        if position < len(buffer):
+            char = buffer[position]
+            if expected == '[':
+                if char != '[':
+                    raise json.JSONDecodeError('Ожидается JSON массив', buffer, position)
+                expected = 'first'
+                position += 1
+                continue
+            if expected == 'end':
+                raise json.JSONDecodeError('Лишние данные после JSON массива', buffer, position)
+            if char == ']' and expected in ('first', ','):
+                expected = 'end'
+                position += 1
+                continue
+            if expected == ',':
+                if char != ',':
+                    raise json.JSONDecodeError("Ожидается ',' или ']'", buffer, position)
+                expected = 'item'
+                position += 1
+                continue
+            if char in ',]':
+                raise json.JSONDecodeError('Ожидается элемент массива', buffer, position)
+            try:
+                book, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Элемент прочитан не полностью - нужно дочитать файл.
+                if eof:
+                    raise
+            else:
+                yield Book(**book)
+                expected = ','
+                # Разделитель после элемента обычно уже в буфере и разбирается сразу.
+                position = JSON_WHITESPACE.match(buffer, end).end()
+                if buffer.startswith(',', position):
+                    expected = 'item'
+                    position += 1
+                continue
+        if eof:
+            if expected not in ('[', 'end'):
+                raise json.JSONDecodeError('Незавершённый JSON массив', buffer, position)
+            return
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk  # Уже разобранная часть буфера отбрасывается.
+        position = 0
+
+
+# Функция для потоковой записи книг в файл в виде JSON массива.
+def write_json_books(file, books):
+    file.write('[')
+    for number, book in enumerate(books):
+        if number:
+            file.write(',')
+        file.write('\n')
+        json.dump(book.to_dict(), file, ensure_ascii=False)
+    file.write('\n]')
+
+
+# Функция для проверки, что каждое слово запроса является префиксом какого-либо слова текста.
+def matches_terms(text, terms):
+    tokens = tokenize(text)
+    return all(any(token.startswith(term) for token in tokens) for term in terms)
+
+
+# Функция для определения формата файла импорта и экспорта по расширению.
+def file_format_of(filename):
+    file_format = os.path.splitext(filename)[1].lower().lstrip('.')
+    if file_format not in ('csv', 'jsonl'):
+        raise ValueError(f"Неподдерживаемый формат файла '{filename}', ожидается .csv или .jsonl")
+    return file_format
+
+
+# Функция для создания таблицы prettytable со списком книг.
+def make_table(books):
+    table = PrettyTable()  # Используем библиотеку prettytable для красивого отображения книг в виде таблицы
+    table.field_names = TABLE_FIELDS  # Имена полей таблицы
+    for book in books:
+        # Добавление информации о каждой книге в таблицу.
+        table.add_row([book.book_id, book.title, book.author, book.year, book.status])
+    return table
+
+
+# Функция для разбиения книг на страницы. Возвращает генератор таблиц по page_size книг;
+# ширина столбцов вычисляется отдельно для каждой страницы.
+def iter_pages(books, page_size=DEFAULT_PAGE_SIZE):
+    books = iter(books)
+    while True:
+        page = list(itertools.islice(books, page_size))
+        if not page:
+            return
+        yield make_table(page)
+
+
+# Функция для постраничного вывода таблиц в консоль.
+def show_pages(pages):
+    pages = iter(pages)
+    table = next(pages, None)
+    number = 1
+    while table is not None:
+        print(f'\nСтраница {number}')
+        print(table)
+        table = next(pages, None)
+        if table is not None and input('\nEnter - следующая страница, q - вернуться в меню:\n').strip().lower() == 'q':
+            break
+        number += 1
+
 
 class Book:
     """
         Класс Book представляет книгу с уникальным идентификатором, названием, автором, годом издания и статусом.
     """
+    # Атрибуты хранятся в слотах, без отдельного словаря __dict__ у каждого объекта.
+    __slots__ = BOOK_FIELDS
+
     def __init__(self, book_id, title, author, year, status="В наличии"):
         self.book_id = book_id  # Уникальный идентификатор для каждой книги.
         self.title = title  # Название книги.
-        self.author = author  # Автор книги.
-        self.year = year  # Год издания книги.
-        self.status = status  # Статус книги (по умолчанию "В наличии").
+        self.author = intern_string(author)  # Автор книги.
+        self.year = intern_string(year)  # Год издания книги.
+        self.status = intern_string(status)  # Статус книги (по умолчанию "В наличии").
+
+    # Метод для преобразования книги в словарь для записи в JSON.
+    def to_dict(self):
+        return {field: getattr(self, field) for field in BOOK_FIELDS}
+
+
+class BookRow:
+    """
+        Класс BookRow представляет книгу, хранящуюся в строке таблицы BookTable.
+        Атрибуты читаются из столбцов таблицы и записываются в них, как у объекта Book.
+    """
+    __slots__ = ('_table', 'book_id')
+
+    def __init__(self, table, book_id):
+        self._table = table  # Таблица, в которой хранится книга.
+        self.book_id = book_id  # Уникальный идентификатор книги.
+
+    @property
+    def title(self):
+        return self._table.get_title(self._table.rows[self.book_id])
+
+    @title.setter
+    def title(self, title):
+        self._table.set_title(self._table.rows[self.book_id], title)
+
+    @property
+    def author(self):
+        return self._table.authors[self._table.rows[self.book_id]]
+
+    @author.setter
+    def author(self, author):
+        self._table.authors[self._table.rows[self.book_id]] = intern_string(author)
+
+    @property
+    def year(self):
+        row = self._table.rows[self.book_id]
+        if row in self._table.irregular_years:
+            return self._table.irregular_years[row]
+        return str(self._table.years[row])
+
+    @year.setter
+    def year(self, year):
+        self._table.set_year(self._table.rows[self.book_id], year)
+
+    @property
+    def status(self):
+        return self._table.status_names[self._table.statuses[self._table.rows[self.book_id]]]
+
+    @status.setter
+    def status(self, status):
+        self._table.statuses[self._table.rows[self.book_id]] = self._table.status_code(status)
+
+    # Метод для преобразования книги в словарь для записи в JSON.
+    def to_dict(self):
+        return {field: getattr(self, field) for field in BOOK_FIELDS}
+
+
+class BookTable(MutableMapping):
+    """
+        Класс BookTable хранит книги по столбцам: каждое поле книги находится в отдельном массиве.
+        Названия хранятся в общем буфере UTF-8, год - в array('H'), статус - номером в array('B'),
+        поэтому на книгу не создаются отдельные объекты. Таблица работает как словарь
+        "ID книги -> BookRow" с порядком добавления.
+    """
+    def __init__(self, books=()):
+        self.rows = {}  # Номер строки таблицы по ID книги.
+        self.book_ids = []  # Столбец ID книг; None у удалённых строк.
+        self.title_data = bytearray()  # Названия книг в кодировке UTF-8 подряд.
+        self.title_starts = array('Q')  # Начало названия в title_data для каждой строки.
+        self.title_lengths = array('I')  # Длина названия в байтах для каждой строки.
+        self.authors = []  # Столбец авторов (строки интернированы).
+        self.years = array('H')  # Столбец годов издания.
+        self.irregular_years = {}  # Годы, которые нельзя хранить числом без потери формата, по номеру строки.
+        self.statuses = array('B')  # Столбец номеров статусов.
+        self.status_names = []  # Названия статусов по номеру.
+        self._status_codes = {}  # Номера статусов по названию.
+        for book in books:
+            self[book.book_id] = book
+
+    # Метод для получения номера статуса. Новые статусы добавляются в перечисление.
+    def status_code(self, status):
+        code = self._status_codes.get(status)
+        if code is None:
+            if len(self.status_names) > 255:
+                raise ValueError('Слишком много различных статусов книг')
+            code = self._status_codes[status] = len(self.status_names)
+            self.status_names.append(intern_string(status))
+        return code
+
+    # Метод для чтения названия книги из буфера.
+    def get_title(self, row):
+        start = self.title_starts[row]
+        return self.title_data[start:start + self.title_lengths[row]].decode('utf-8')
+
+    # Метод для записи названия книги. Новое значение дописывается в конец буфера.
+    def set_title(self, row, title):
+        data = title.encode('utf-8')
+        self.title_starts[row] = len(self.title_data)
+        self.title_lengths[row] = len(data)
+        self.title_data += data
+
+    # Метод для записи года издания в строку таблицы.
+    def set_year(self, row, year):
+        if type(year) is str and year.isdigit() and str(int(year)) == year and int(year) <= 0xFFFF:
+            self.years[row] = int(year)
+            self.irregular_years.pop(row, None)
+        else:
+            # Год хранится как есть, чтобы при записи в JSON получить исходное значение.
+            self.years[row] = 0
+            self.irregular_years[row] = year
+
+    def __getitem__(self, book_id):
+        if book_id not in self.rows:
+            raise KeyError(book_id)
+        return BookRow(self, book_id)
+
+    # Удаление книги с возвратом отдельного объекта Book, так как строка таблицы после удаления недоступна.
+    def pop(self, book_id, *default):
+        if book_id not in self.rows:
+            if default:
+                return default[0]
+            raise KeyError(book_id)
+        book = Book(**self[book_id].to_dict())
+        del self[book_id]
+        return book
+
+    # Добавление книги в конец таблицы. Если книга с таким ID уже есть, её строка удаляется.
+    def __setitem__(self, book_id, book):
+        if book_id in self.rows:
+            del self[book_id]
+        row = len(self.book_ids)
+        self.years.append(0)
+        self.set_year(row, book.year)
+        self.title_starts.append(0)
+        self.title_lengths.append(0)
+        self.set_title(row, book.title)
+        self.statuses.append(self.status_code(book.status))
+        self.book_ids.append(book_id)
+        self.authors.append(intern_string(book.author))
+        self.rows[book_id] = row
+
+    # Удаление строки помечает её пустой; таблица уплотняется, когда пустых строк становится больше половины.
+    def __delitem__(self, book_id):
+        row = self.rows.pop(book_id)
+        self.book_ids[row] = None
+        self.title_lengths[row] = 0
+        self.authors[row] = None
+        self.irregular_years.pop(row, None)
+        if len(self.rows) * 2 < len(self.book_ids):
+            self._compact()
+
+    # Метод для удаления пустых строк из столбцов.
+    def _compact(self):
+        live_rows = list(self.rows.values())
+        titles = [self.get_title(row) for row in live_rows]
+        self.book_ids = [self.book_ids[row] for row in live_rows]
+        self.title_data = bytearray()
+        self.title_starts = array('Q', bytes(8 * len(live_rows)))
+        self.title_lengths = array('I', bytes(4 * len(live_rows)))
+        for row, title in enumerate(titles):
+            self.set_title(row, title)
+        self.authors = [self.authors[row] for row in live_rows]
+        self.years = array('H', (self.years[row] for row in live_rows))
+        self.statuses = array('B', (self.statuses[row] for row in live_rows))
+        self.irregular_years = {new_row: self.irregular_years[row]
+                                for new_row, row in enumerate(live_rows) if row in self.irregular_years}
+        self.rows = {book_id: row for row, book_id in enumerate(self.book_ids)}
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, book_id):
+        return book_id in self.rows
+
+
+# Функция для кодирования значения поля книги для двоичного снимка. Возвращает вид значения и байты:
+# строки хранятся в UTF-8, остальные значения (например, числовой ID или год) - в виде JSON,
+# поэтому типы значений сохраняются без потерь.
+def encode_snapshot_value(value):
+    if type(value) is str:
+        return SNAPSHOT_STRING, value.encode('utf-8', 'surrogatepass')
+    return SNAPSHOT_JSON, json.dumps(value).encode('utf-8')
+
+
+# Функция для записи книг в двоичный снимок в открытый на запись в двоичном режиме файл.
+# Формат: заголовок, таблица строк, записи книг фиксированной длины (номера строк пяти полей),
+# хэш-индекс "ID -> номер записи", смещения строк в файле и виды строк.
+# Повторяющиеся значения (авторы, годы, статусы) хранятся в таблице строк один раз.
+def write_binary_snapshot(file, books):
+    file.write(bytes(SNAPSHOT_HEADER.size))  # Заголовок записывается после того, как известны размеры частей.
+    records = array('I')  # Номера строк полей книг, по пять на книгу.
+    offsets = array('Q', [SNAPSHOT_HEADER.size])  # Смещение начала каждой строки и конца последней строки.
+    kinds = array('B')  # Вид каждой строки: SNAPSHOT_STRING или SNAPSHOT_JSON.
+    hashes = array('I')  # Хэши ID книг для построения индекса.
+    shared = {}  # Уже записанные повторяющиеся значения: (вид, байты) -> номер строки.
+    for book in books:
+        for field in BOOK_FIELDS:
+            kind, data = encode_snapshot_value(getattr(book, field))
+            if field == 'book_id':
+                hashes.append(zlib.crc32(data, kind))
+            elif field not in ('title',):
+                number = shared.get((kind, data))
+                if number is not None:
+                    records.append(number)
+                    continue
+                shared[kind, data] = len(kinds)
+            records.append(len(kinds))
+            file.write(data)
+            offsets.append(offsets[-1] + len(data))
+            kinds.append(kind)
+
+    # Индекс с открытой адресацией: ячеек вдвое больше, чем книг, свободная ячейка - SNAPSHOT_EMPTY.
+    count = len(hashes)
+    slots = 1
+    while slots < count * 2:
+        slots *= 2
+    index = array('I', [SNAPSHOT_EMPTY]) * slots
+    mask = slots - 1
+    for record, book_hash in enumerate(hashes):
+        slot = book_hash & mask
+        while index[slot] != SNAPSHOT_EMPTY:
+            slot = (slot + 1) & mask
+        index[slot] = record
+
+    # Числовые массивы выравниваются по 8 байт, чтобы читать их из mmap без копирования.
+    positions = []
+    for part in (records, index, offsets, kinds):
+        file.write(bytes(-file.tell() % 8))
+        positions.append(file.tell())
+        part.tofile(file)
+    file.seek(0)
+    file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.byteorder == 'little',
+                                    count, len(kinds), slots, *positions))
+    file.seek(0, os.SEEK_END)
+
+
+# Функция для определения формата файла библиотеки по расширению: двоичный снимок или JSON.
+def is_binary_snapshot(filename):
+    return os.path.splitext(filename)[1].lower() == SNAPSHOT_EXTENSION
+
+
+# Функция для преобразования файла библиотеки между форматами JSON и двоичного снимка.
+# Формат определяется по расширению файлов. Возвращает количество книг.
+def convert_snapshot(source, target):
+    count = 0
+
+    # Книги передаются на запись потоком, по пути подсчитывается их количество.
+    def counted(books):
+        nonlocal count
+        for count, book in enumerate(books, 1):
+            yield book
+
+    with contextlib.ExitStack() as stack:
+        if is_binary_snapshot(source):
+            books = SnapshotBooks(source).values()
+        else:
+            books = iter_json_books(stack.enter_context(open(source, 'r', encoding='utf-8')))
+        if is_binary_snapshot(target):
+            with open(target, 'wb') as file:
+                write_binary_snapshot(file, counted(books))
+        else:
+            with open(target, 'w', encoding='utf-8') as file:
+                write_json_books(file, counted(books))
+    return count
+
+
+class SnapshotBooks(MutableMapping):
+    """
+        Класс SnapshotBooks представляет книги двоичного снимка в виде словаря "ID -> Book".
+        Файл отображается в память через mmap, а объект Book создаётся только при обращении к книге,
+        поэтому открытие снимка не зависит от размера каталога. Изменения хранятся в памяти поверх снимка.
+    """
+    def __init__(self, filename):
+        with open(filename, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, little, self._count, strings, slots,
+             records, index, offsets, kinds) = SNAPSHOT_HEADER.unpack_from(self._mmap)
+        except struct.error:
+            raise ValueError(f"Файл '{filename}' не является снимком библиотеки") from None
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"Файл '{filename}' не является снимком библиотеки версии {SNAPSHOT_VERSION}")
+        if little != (sys.byteorder == 'little'):
+            raise ValueError(f"Снимок '{filename}' записан на платформе с другим порядком байтов")
+        view = memoryview(self._mmap)
+        self._records = view[records:records + self._count * 20].cast('I')  # Пять номеров строк на книгу.
+        self._index = view[index:index + slots * 4].cast('I')  # Хэш-индекс "ID -> номер записи".
+        self._offsets = view[offsets:offsets + (strings + 1) * 8].cast('Q')  # Смещения строк.
+        self._kinds = view[kinds:kinds + strings]  # Виды строк.
+        self._overlay = {}  # Книги снимка, к которым уже обращались или которые заменены, по ID.
+        self._appended = {}  # Книги, добавленные после открытия снимка, по ID в порядке добавления.
+        self._deleted = set()  # ID удалённых книг снимка.
+        self._shared = {}  # Декодированные повторяющиеся значения полей: номер строки -> значение.
+
+    # Метод для чтения строки таблицы строк по номеру.
+    def _string(self, number):
+        data = self._mmap[self._offsets[number]:self._offsets[number + 1]]
+        if self._kinds[number] == SNAPSHOT_STRING:
+            return data.decode('utf-8', 'surrogatepass')
+        return json.loads(data)
+
+    # Метод для создания объекта Book из записи снимка.
+    def _record_book(self, record):
+        book_id, title, author, year, status = self._records[record * 5:record * 5 + 5]
+        shared = self._shared
+        # Автор, год и статус повторяются у многих книг, поэтому их значения декодируются один раз.
+        for number in (author, year, status):
+            if number not in shared:
+                shared[number] = self._string(number)
+        return Book(self._string(book_id), self._string(title), shared[author], shared[year], shared[status])
+
+    # Метод для поиска номера записи книги снимка по ID через хэш-индекс. Возвращает None, если книги нет.
+    def _find(self, book_id):
+        if not self._count:
+            return None
+        kind, data = encode_snapshot_value(book_id)
+        mask = len(self._index) - 1
+        slot = zlib.crc32(data, kind) & mask
+        while True:
+            record = self._index[slot]
+            if record == SNAPSHOT_EMPTY:
+                return None
+            number = self._records[record * 5]
+            if self._kinds[number] == kind and self._mmap[self._offsets[number]:self._offsets[number + 1]] == data:
+                return record
+            slot = (slot + 1) & mask
+
+    # Метод для проверки, что ID принадлежит неудалённой книге снимка.
+    def _in_snapshot(self, book_id):
+        return book_id in self._overlay or (book_id not in self._deleted and self._find(book_id) is not None)
+
+    def __getitem__(self, book_id):
+        if book_id in self._appended:
+            return self._appended[book_id]
+        if book_id in self._overlay:
+            return self._overlay[book_id]
+        record = None if book_id in self._deleted else self._find(book_id)
+        if record is None:
+            raise KeyError(book_id)
+        # Созданный объект запоминается, чтобы изменения книги (например, статуса) сохранялись.
+        book = self._overlay[book_id] = self._record_book(record)
+        return book
+
+    def __setitem__(self, book_id, book):
+        if book_id not in self._appended and self._in_snapshot(book_id):
+            # Заменённая книга снимка остаётся на своём месте, как в словаре.
+            self._overlay[book_id] = book
+        else:
+            self._appended[book_id] = book
+
+    def __delitem__(self, book_id):
+        if book_id in self._appended:
+            del self._appended[book_id]
+        elif self._in_snapshot(book_id):
+            self._overlay.pop(book_id, None)
+            self._deleted.add(book_id)
+        else:
+            raise KeyError(book_id)
+
+    def __contains__(self, book_id):
+        return book_id in self._appended or self._in_snapshot(book_id)
+
+    def __len__(self):
+        return self._count - len(self._deleted) + len(self._appended)
+
+    def __iter__(self):
+        for record in range(self._count):
+            book_id = self._string(self._records[record * 5])
+            if book_id not in self._deleted:
+                yield book_id
+        yield from self._appended
+
+    # Перебор книг без запоминания созданных объектов, чтобы полный проход не загружал каталог в память.
+    def values(self):
+        for record in range(self._count):
+            if self._overlay or self._deleted:
+                book_id = self._string(self._records[record * 5])
+                if book_id in self._deleted:
+                    continue
+                if book_id in self._overlay:
+                    yield self._overlay[book_id]
+                    continue
+            yield self._record_book(record)
+        yield from self._appended.values()
+
+
+class TrigramIndex:
+    """
+        Класс TrigramIndex хранит триграммный индекс словаря: триграмма -> длина слова -> множество слов.
+        Похожие слова ищутся только среди слов, у которых есть общие триграммы с запросом
+        и длина отличается не больше, чем на допустимое число опечаток.
+    """
+    def __init__(self, words=()):
+        self._postings = {}  # Триграмма -> длина слова -> множество слов с этой триграммой.
+        self._sizes = {}  # Количество различных триграмм каждого слова.
+        for word in words:
+            self.add(word)
+
+    # Метод для добавления слова в индекс.
+    def add(self, word):
+        if word in self._sizes:
+            return
+        grams = trigrams(word)
+        self._sizes[word] = len(grams)
+        for gram in grams:
+            by_length = self._postings.get(gram)
+            if by_length is None:
+                by_length = self._postings[gram] = {}
+            words = by_length.get(len(word))
+            if words is None:
+                words = by_length[len(word)] = set()
+            words.add(word)
+
+    # Метод для удаления слова из индекса.
+    def discard(self, word):
+        if self._sizes.pop(word, None) is None:
+            return
+        for gram in trigrams(word):
+            by_length = self._postings[gram]
+            words = by_length[len(word)]
+            words.discard(word)
+            if not words:
+                del by_length[len(word)]
+                if not by_length:
+                    del self._postings[gram]
+
+    # Метод для поиска слов, отличающихся от word не больше чем на max_distance правок.
+    # Кандидаты сначала отбираются по сходству множеств триграмм (коэффициент Жаккара),
+    # затем для лучших candidates кандидатов вычисляется ограниченное расстояние Левенштейна.
+    # Возвращает список (расстояние, -сходство, слово), лучшие первыми.
+    def match(self, word, max_distance, candidates=FUZZY_CANDIDATES):
+        grams = trigrams(word)
+        lengths = range(len(word) - max_distance, len(word) + max_distance + 1)
+        counts = Counter()  # Слово -> количество общих с запросом триграмм.
+        for gram in grams:
+            by_length = self._postings.get(gram)
+            if by_length is not None:
+                for length in lengths:
+                    words = by_length.get(length)
+                    if words is not None:
+                        counts.update(words)
+        sizes = self._sizes
+        similarity = {candidate: common / (len(grams) + sizes[candidate] - common)
+                      for candidate, common in counts.items()}
+        results = []
+        # При равном сходстве кандидаты выбираются по самому слову, чтобы результат не зависел от хэширования.
+        for candidate in heapq.nlargest(candidates, similarity, key=lambda word: (similarity[word], word)):
+            distance = bounded_levenshtein(word, candidate, max_distance)
+            if distance is not None:
+                results.append((distance, -similarity[candidate], candidate))
+        results.sort()
+        return results
+
+
+class MethodMetrics:
+    """
+        Класс MethodMetrics накапливает статистику вызовов одного метода библиотеки: количество вызовов и ошибок,
+        гистограмму задержек по степеням двойки в микросекундах, записанные байты и просмотренные книги.
+    """
+    __slots__ = ('calls', 'errors', 'seconds', 'max_seconds', 'latency', 'bytes_written', 'max_bytes_written',
+                 'books_scanned', 'max_books_scanned')
+
+    def __init__(self):
+        self.calls = 0  # Количество вызовов.
+        self.errors = 0  # Количество вызовов, завершившихся исключением.
+        self.seconds = 0.0  # Суммарное время вызовов.
+        self.max_seconds = 0.0  # Самый долгий вызов.
+        self.latency = {}  # Гистограмма задержек: номер корзины -> количество вызовов.
+        self.bytes_written = 0  # Всего байт записано на диск во время вызовов.
+        self.max_bytes_written = 0  # Больше всего байт, записанных за один вызов.
+        self.books_scanned = 0  # Всего книг просмотрено во время вызовов.
+        self.max_books_scanned = 0  # Больше всего книг, просмотренных за один вызов.
+
+    # Метод для учёта одного вызова.
+    def record(self, seconds, bytes_written, books_scanned):
+        self.calls += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        # Корзина n содержит вызовы длительностью меньше 2**n мкс и не меньше 2**(n - 1) мкс.
+        bucket = int(seconds * 1_000_000).bit_length()
+        self.latency[bucket] = self.latency.get(bucket, 0) + 1
+        self.bytes_written += bytes_written
+        self.max_bytes_written = max(self.max_bytes_written, bytes_written)
+        self.books_scanned += books_scanned
+        self.max_books_scanned = max(self.max_books_scanned, books_scanned)
+
+    # Метод для получения статистики в виде словаря, пригодного для записи в JSON.
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': round(self.seconds * 1000, 3),
+            'mean_us': round(self.seconds / self.calls * 1_000_000, 2) if self.calls else 0,
+            'max_us': round(self.max_seconds * 1_000_000, 2),
+            'latency_us': {f'<{2 ** bucket}': count for bucket, count in sorted(self.latency.items())},
+            'bytes_written': self.bytes_written,
+            'max_bytes_written': self.max_bytes_written,
+            'books_scanned': self.books_scanned,
+            'max_books_scanned': self.max_books_scanned,
+        }
+
+
+class LibraryMetrics:
+    """
+        Класс LibraryMetrics собирает метрики операций библиотеки. Методы библиотеки заменяются обёртками
+        только при включении метрик, поэтому без них библиотека работает без дополнительных затрат.
+        Если указан файл dump_filename, снимок метрик дописывается в него строкой JSON не чаще,
+        чем раз в dump_interval секунд, и при выключении метрик.
+    """
+    def __init__(self, library, dump_filename=None, dump_interval=METRICS_DUMP_INTERVAL):
+        self.library = library  # Библиотека, операции которой измеряются.
+        self.dump_filename = dump_filename  # Файл JSONL для периодической записи снимков метрик.
+        self.dump_interval = dump_interval  # Минимальный интервал между записями снимков в секундах.
+        self.methods = {}  # Статистика по именам методов.
+        self.started = time.time()  # Время включения метрик.
+        self._last_dump = time.monotonic()  # Время последней записи снимка.
+
+    # Метод для создания обёртки, измеряющей вызовы метода name.
+    def wrap(self, name, method):
+        stats = self.methods.setdefault(name, MethodMetrics())
+        library = self.library
+
+        @functools.wraps(method)
+        def measured(*args, **kwargs):
+            bytes_written, books_scanned = library.bytes_written, library.books_scanned
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except BaseException:
+                stats.errors += 1
+                raise
+            finally:
+                stats.record(time.perf_counter() - start, library.bytes_written - bytes_written,
+                             library.books_scanned - books_scanned)
+                if self.dump_filename is not None and time.monotonic() - self._last_dump >= self.dump_interval:
+                    self.dump()
+        return measured
+
+    # Метод для получения снимка метрик.
+    def snapshot(self):
+        return {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'uptime_s': round(time.time() - self.started, 3),
+            'bytes_written': self.library.bytes_written,
+            'books_scanned': self.library.books_scanned,
+            'cache': self.library.cache_info(),
+            'methods': {name: stats.to_dict() for name, stats in self.methods.items() if stats.calls},
+        }
+
+    # Метод для записи снимка метрик строкой JSON в конец файла dump_filename.
+    def dump(self):
+        self._last_dump = time.monotonic()
+        with open(self.dump_filename, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(self.snapshot(), ensure_ascii=False) + '\n')
+
+
+class StaleVersionError(Exception):
+    """
+        Исключение StaleVersionError возникает при изменении книги, если её версия не совпадает с ожидаемой,
+        то есть книга была изменена (в том числе другим процессом) после того, как вызывающий код её прочитал.
+    """
 
 
 class Library:
     """
         Класс Library представляет библиотеку, которая управляет коллекцией книг.
     """
-    def __init__(self, filename='library.json'):
+    backend = 'json'  # Имя бэкенда хранения.
+    _batch_records = None  # Изменения, накопленные внутри batch(); None вне блока.
+    _lock_fd = None  # Дескриптор файла блокировки, пока библиотека удерживает блокировку; None вне блокировки.
+    _seq = 0  # Номер последнего изменения библиотеки, увеличивается с каждой записью.
+    _checkpoint = 0  # Версия книг, которых нет в _versions: книг, не изменявшихся с появления журнала.
+    _metrics = None  # Сборщик метрик LibraryMetrics; None, пока метрики не включены.
+    bytes_written = 0  # Всего байт записано в файлы библиотеки и журнала.
+    books_scanned = 0  # Всего книг просмотрено при поиске.
+
+    # Выбор реализации библиотеки по имени бэкенда хранения, например Library(backend='sqlite', path='library.db').
+    # При lazy=True JSON файл не загружается в память, а читается потоково (см. LazyLibrary).
+    def __new__(cls, *args, backend='json', lazy=False, **kwargs):
+        if cls is Library:
+            if backend not in BACKENDS:
+                raise ValueError(f"Неизвестный бэкенд хранения '{backend}'")
+            cls = LazyLibrary if lazy and backend == 'json' else BACKENDS[backend]
+        return super().__new__(cls)
+
+    def __init__(self, filename='library.json', journal=False, journal_limit=1000, backend='json', path=None,
+                 columnar=False, cache_size=SEARCH_CACHE_SIZE):
+        if path is not None:
+            filename = path
         self.filename = filename  # Имя файла для хранения данных библиотеки.
+        self.columnar = columnar  # Хранение книг по столбцам в BookTable вместо отдельных объектов Book.
+        self.journal = journal  # Режим журнала: изменения дописываются в журнал, а не перезаписывают весь файл.
+        self.journal_filename = filename + '.journal'  # Имя файла журнала изменений.
+        self.journal_limit = journal_limit  # Минимальное число записей журнала, после которого выполняется сжатие.
+        self._journal_file = None  # Открытый на дозапись файл журнала.
+        self._journal_records = 0  # Количество записей в журнале с момента последнего сжатия.
+        self._journal_offset = 0  # Размер уже прочитанной части журнала в байтах.
+        self._snapshot_stamp = None  # Идентификатор прочитанного файла снимка, меняется при сжатии журнала.
+        self._versions = {}  # Версии книг, изменённых после снимка: ID -> номер изменения.
+        self._books = {}  # Индекс книг по ID (словарь или BookTable); сохраняет порядок добавления книг.
+        self._books_view = None  # Кэшированный кортеж книг для свойства books.
+        self._token_index = None  # Инвертированный индекс токенов, строится при первом поиске.
+        self._trigram_index = None  # Триграммные индексы словарей полей, строятся при первом нечётком поиске.
+        self._year_index = {}  # Индекс по году издания: год -> ID книг этого года.
+        self._years = []  # Отсортированный список годов, присутствующих в индексе.
+        self._status_index = {}  # Индекс по статусу: статус -> ID книг с этим статусом.
+        self._init_search_cache(cache_size)
         self.books = self.load_books()  # Загрузка книг из файла при инициализации библиотеки.
 
+    # Свойство со всеми книгами библиотеки в порядке добавления.
+    @property
+    def books(self):
+        # Кортеж строится заново только после изменения библиотеки.
+        if self._books_view is None:
+            self._books_view = tuple(self._books.values())
+        return self._books_view
+
+    # Присваивание списка книг перестраивает индекс по ID.
+    @books.setter
+    def books(self, books):
+        self._books_view = None
+        self._token_index = None
+        self._trigram_index = None
+        self.clear_search_cache()
+        if isinstance(books, SnapshotBooks) and not self.columnar:
+            # Книги двоичного снимка используются без копирования и создаются при обращении,
+            # поэтому индексы по году и статусу строятся только при первом запросе к ним.
+            self._books = books
+            self._year_index = self._status_index = None
+            return
+        if self.columnar:
+            # Книги двоичного снимка перекладываются в столбцы; перебор самого снимка даёт только ID.
+            self._books = BookTable(books.values() if isinstance(books, SnapshotBooks) else books)
+        else:
+            self._books = {book.book_id: book for book in books}
+        self._build_indexes()
+
+    # Метод для построения индексов по году и статусу за один проход по книгам.
+    # Год каждой книги преобразуется в число один раз.
+    def _build_indexes(self):
+        self._year_index = {}
+        self._status_index = {}
+        for book in self._books.values():
+            self._index_year(book, keep_sorted=False)
+            self._index_status(book)
+        self._years = sorted(self._year_index)
+
+    # Количество книг в библиотеке.
+    def __len__(self):
+        return len(self._books)
+
+    # Метод для последовательного перебора книг без построения списка.
+    # Аргументы start и stop позволяют получить часть каталога, например одну страницу.
+    def iter_books(self, start=0, stop=None):
+        return itertools.islice(self._books.values(), start, stop)
+
+    # Метод для постраничного перебора всех книг в виде таблиц prettytable.
+    def iter_pages(self, page_size=DEFAULT_PAGE_SIZE):
+        return iter_pages(self.iter_books(), page_size)
+
+    # Метод для получения книги по ID за O(1). Возвращает None, если книга не найдена.
+    def get_book(self, book_id):
+        return self._books.get(book_id)
+
+    # Метод для добавления книги в хранилище и индексы.
+    def _insert(self, book):
+        old = self._books.get(book.book_id)
+        if old is not None:
+            # Книга с тем же ID заменяется: старые данные удаляются из индексов по году, статусу и токенам,
+            # а результаты поиска по старым данным устаревают. Новая книга, как и в SQLite, переносится
+            # в конец каталога, поэтому порядок каталога и результатов поиска совпадает.
+            self._unindex_year(old)
+            self._unindex_status(old)
+            if self._token_index is not None:
+                self._unindex_book(old)
+            self._invalidate_search(old)
+            del self._books[book.book_id]
+        self._invalidate_search(book)
+        self._books[book.book_id] = book
+        self._books_view = None
+        self._index_year(book)
+        self._index_status(book)
+        if self._token_index is not None:
+            self._index_book(book)
+
+    # Метод для удаления существующей книги из хранилища и индексов.
+    def _remove(self, book):
+        # Книга удаляется из словаря без копирования списка книг.
+        # BookTable возвращает отдельную копию книги, так как её строка после удаления недоступна.
+        self._invalidate_search(book)
+        book = self._books.pop(book.book_id)
+        self._books_view = None
+        self._unindex_year(book)
+        self._unindex_status(book)
+        if self._token_index is not None:
+            self._unindex_book(book)
+
+    # Метод для получения нескольких книг по ID. Возвращает словарь только найденных книг.
+    def _get_books(self, book_ids):
+        return {book_id: self._books[book_id] for book_id in book_ids if book_id in self._books}
+
+    # Метод для изменения статуса книги в хранилище. Результаты поиска ссылаются на те же объекты книг,
+    # поэтому кэш поиска при изменении статуса остаётся верным.
+    def _set_status(self, book, status):
+        self._unindex_status(book)
+        book.status = status
+        self._index_status(book)
+
+    # Метод для создания пустого кэша результатов поиска размером cache_size запросов (0 отключает кэш).
+    def _init_search_cache(self, cache_size):
+        self.cache_size = cache_size  # Максимальное количество запросов в кэше поиска.
+        self.cache_hits = 0  # Количество поисков, результат которых взят из кэша.
+        self.cache_misses = 0  # Количество поисков, выполненных по индексу или файлу.
+        self.clear_search_cache()
+
+    # Метод для очистки кэша поиска.
+    def clear_search_cache(self):
+        self._search_cache = OrderedDict()  # (поле, слова запроса) -> (результаты, все ли результаты найдены).
+        self._cache_terms = {}  # (поле, слово запроса) -> ключи кэша, содержащие это слово.
+
+    # Метод для получения статистики кэша поиска: попадания, промахи, текущий и максимальный размер.
+    def cache_info(self):
+        return {'hits': self.cache_hits, 'misses': self.cache_misses, 'size': len(self._search_cache),
+                'maxsize': self.cache_size}
+
+    # Метод для включения метрик: методы из METRIC_METHODS заменяются у этого объекта обёртками,
+    # которые считают вызовы, задержки, записанные байты и просмотренные книги.
+    # Если указан dump_filename, снимки метрик периодически дописываются в этот файл JSONL.
+    def enable_metrics(self, dump_filename=None, dump_interval=METRICS_DUMP_INTERVAL):
+        if self._metrics is None:
+            self._metrics = LibraryMetrics(self, dump_filename, dump_interval)
+            for name in METRIC_METHODS:
+                method = getattr(self, name, None)
+                if method is not None:
+                    setattr(self, name, self._metrics.wrap(name, method))
+        return self._metrics
+
+    # Метод для выключения метрик: обёртки удаляются, последний снимок записывается в файл.
+    def disable_metrics(self):
+        if self._metrics is None:
+            return
+        for name in METRIC_METHODS:
+            self.__dict__.pop(name, None)
+        if self._metrics.dump_filename is not None:
+            self._metrics.dump()
+        self._metrics = None
+
+    # Метод для получения снимка метрик. Возвращает None, если метрики не включены.
+    def metrics(self):
+        return self._metrics.snapshot() if self._metrics is not None else None
+
+    # Метод для удаления результата из кэша поиска.
+    def _drop_cached(self, key):
+        del self._search_cache[key]
+        field, terms = key
+        for term in terms:
+            keys = self._cache_terms[field, term]
+            keys.discard(key)
+            if not keys:
+                del self._cache_terms[field, term]
+
+    # Метод для удаления из кэша только тех результатов, в которые книга попадает по своим словам,
+    # то есть результатов, которые может изменить добавление, удаление или изменение этой книги.
+    def _invalidate_search(self, book):
+        if not self._search_cache:
+            return
+        for field in SEARCH_FIELDS:
+            tokens = set(tokenize(getattr(book, field)))
+            # Запросы, в которых есть слово, являющееся префиксом одного из токенов книги.
+            keys = set()
+            for token in tokens:
+                for end in range(1, len(token) + 1):
+                    keys.update(self._cache_terms.get((field, token[:end]), ()))
+            for key in keys:
+                if all(any(token.startswith(term) for token in tokens) for term in key[1]):
+                    self._drop_cached(key)
+
+    # Метод для поиска книг по полю (title или author).
+    # Каждое слово запроса должно быть префиксом какого-либо слова в поле книги.
+    # Результаты хранятся в LRU кэше по полю и нормализованным словам запроса.
+    def search(self, field, query, limit=None):
+        if field not in SEARCH_FIELDS:
+            raise ValueError(f"Поиск по полю '{field}' не поддерживается")
+        terms = frozenset(tokenize(query))
+        if not terms or limit == 0:
+            return []
+        key = (field, terms)
+        cached = self._search_cache.get(key)
+        # Результат, найденный с лимитом, подходит только для запросов с не большим лимитом.
+        if cached is not None and (cached[1] or (limit is not None and limit <= len(cached[0]))):
+            self._search_cache.move_to_end(key)
+            self.cache_hits += 1
+            return cached[0][:limit]
+        self.cache_misses += 1
+        results = self._search(field, terms, limit)
+        if self.cache_size and len(results) <= SEARCH_CACHE_MAX_RESULTS:
+            if cached is not None:
+                self._drop_cached(key)
+            self._search_cache[key] = (results, limit is None or len(results) < limit)
+            for term in terms:
+                self._cache_terms.setdefault((field, term), set()).add(key)
+            if len(self._search_cache) > self.cache_size:
+                self._drop_cached(next(iter(self._search_cache)))
+        return results[:]  # Вызывающий код получает копию списка, чтобы не изменить результат в кэше.
+
+    # Метод для нечёткого поиска книг по названию или автору с учётом опечаток.
+    # Каждое слово запроса сопоставляется со словами поля, отличающимися не больше чем на max_distance
+    # правок (по умолчанию 0-2 в зависимости от длины слова, см. fuzzy_distance()).
+    # Книги упорядочиваются по сумме расстояний, затем по сходству триграмм. Возвращает не больше limit книг.
+    def fuzzy_search(self, field, query, limit=FUZZY_SEARCH_LIMIT, max_distance=None):
+        if field not in SEARCH_FIELDS:
+            raise ValueError(f"Поиск по полю '{field}' не поддерживается")
+        terms = list(dict.fromkeys(tokenize(query)))  # Слова запроса без повторов.
+        if not terms or limit == 0:
+            return []
+        distances = [fuzzy_distance(term) if max_distance is None else max_distance for term in terms]
+        return self._fuzzy_search(field, terms, distances, limit)
+
+    # Нечёткий поиск по триграммному индексу словаря поля: просматриваются только книги с похожими словами.
+    def _fuzzy_search(self, field, terms, distances, limit):
+        if self._token_index is None:
+            self._build_token_index()
+        if self._trigram_index is None:
+            self._trigram_index = {name: TrigramIndex(postings) for name, (postings, tokens)
+                                   in self._token_index.items()}
+        postings = self._token_index[field][0]
+        index = self._trigram_index[field]
+        matches = [index.match(term, distance) for term, distance in zip(terms, distances)]
+        book_ids = rank_fuzzy_matches(matches, postings.__getitem__, limit)
+        self.books_scanned += len(book_ids)
+        return [self._books[book_id] for book_id in book_ids]
+
+    # Метод для построения инвертированного индекса токенов по названию и автору.
+    def _build_token_index(self):
+        # Для каждого поля хранится словарь "токен -> ID книг с номерами их позиций" и отсортированный список токенов.
+        # Номер позиции задаёт порядок результатов поиска: он растёт с каждой добавленной книгой,
+        # поэтому книги в словаре токена упорядочены по позиции.
+        self._token_index = {field: ({}, []) for field in SEARCH_FIELDS}
+        self._token_position = 0  # Номер позиции для следующей добавленной книги.
+        for book in self._books.values():
+            self._index_book(book, keep_sorted=False)
+        for postings, tokens in self._token_index.values():
+            tokens.extend(sorted(postings))
+
+    # Метод для добавления книги в инвертированный индекс.
+    def _index_book(self, book, keep_sorted=True):
+        position = self._token_position
+        self._token_position += 1
+        for field, (postings, tokens) in self._token_index.items():
+            for token in set(tokenize(getattr(book, field))):
+                book_ids = postings.get(token)
+                if book_ids is None:
+                    book_ids = postings[token] = {}
+                    if keep_sorted:
+                        # Новый токен вставляется в отсортированный список для поиска по префиксу.
+                        bisect.insort(tokens, token)
+                    if self._trigram_index is not None:
+                        self._trigram_index[field].add(token)
+                book_ids[book.book_id] = position
+
+    # Метод для удаления книги из инвертированного индекса.
+    def _unindex_book(self, book):
+        for field, (postings, tokens) in self._token_index.items():
+            for token in set(tokenize(getattr(book, field))):
+                book_ids = postings[token]
+                book_ids.pop(book.book_id, None)
+                if not book_ids:
+                    # Токен без книг удаляется из индекса.
+                    del postings[token]
+                    del tokens[bisect.bisect_left(tokens, token)]
+                    if self._trigram_index is not None:
+                        self._trigram_index[field].discard(token)
+
+    # Поиск по инвертированному индексу токенов. Книги возвращаются в порядке добавления,
+    # как и в SQLite (ORDER BY rowid); заменённая книга с тем же ID считается добавленной заново.
+    def _search(self, field, terms, limit):
+        if self._token_index is None:
+            self._build_token_index()
+        postings, tokens = self._token_index[field]
+
+        # Для каждого слова запроса находятся словари ID книг всех токенов с этим префиксом.
+        matches = {}
+        for term in terms:
+            start = bisect.bisect_left(tokens, term)
+            end = bisect.bisect_left(tokens, term + '\U0010ffff', start)
+            matches[term] = [postings[token] for token in tokens[start:end]]
+        # Слова обрабатываются от самого редкого к самому частому.
+        terms = sorted(terms, key=lambda term: sum(map(len, matches[term])))
+        if len(terms) == 1:
+            # Для одного слова уже упорядоченные словари токенов сливаются по позиции без построения
+            # объединения, до достижения лимита. Книга с несколькими токенами слова встретится несколько раз.
+            lists = [book_ids.items() for book_ids in matches[terms[0]]]
+            candidates = lists[0] if len(lists) == 1 else heapq.merge(*lists, key=operator.itemgetter(1))
+        else:
+            candidates = {}
+            for book_ids in matches[terms[0]]:
+                candidates.update(book_ids)
+            for term in terms[1:]:
+                sets = matches[term]
+                if len(candidates) * len(sets) <= sum(map(len, sets)):
+                    # Кандидатов мало - каждый проверяется по словарям токенов слова.
+                    candidates = {book_id: position for book_id, position in candidates.items()
+                                  if any(book_id in book_ids for book_ids in sets)}
+                else:
+                    found = set().union(*sets)
+                    candidates = {book_id: position for book_id, position in candidates.items() if book_id in found}
+                if not candidates:
+                    return []
+            candidates = (heapq.nsmallest(limit, candidates.items(), key=operator.itemgetter(1)) if limit
+                          else sorted(candidates.items(), key=operator.itemgetter(1)))
+
+        results = []
+        seen = set()
+        for book_id, position in candidates:
+            if book_id in seen:
+                continue
+            seen.add(book_id)
+            results.append(self._books[book_id])
+            if len(results) == limit:
+                break
+        self.books_scanned += len(seen)
+        return results
+
+    # Метод для добавления книги в индекс по году издания.
+    def _index_year(self, book, keep_sorted=True):
+        year = parse_year(book.year)
+        if year is None or self._year_index is None:
+            return
+        book_ids = self._year_index.get(year)
+        if book_ids is None:
+            # Словарь используется как упорядоченное множество ID книг.
+            book_ids = self._year_index[year] = {}
+            if keep_sorted:
+                bisect.insort(self._years, year)
+        book_ids[book.book_id] = None
+
+    # Метод для удаления книги из индекса по году издания.
+    def _unindex_year(self, book):
+        year = parse_year(book.year)
+        if year is None or self._year_index is None:
+            return
+        book_ids = self._year_index[year]
+        del book_ids[book.book_id]
+        if not book_ids:
+            del self._year_index[year]
+            del self._years[bisect.bisect_left(self._years, year)]
+
+    # Метод для получения книг, изданных с года start по год end включительно.
+    # Если end не указан, возвращаются книги, изданные в год start. Годы можно передавать и строками.
+    def books_by_year(self, start, end=None):
+        start, end = self._year_range(start, end)
+        if self._year_index is None:
+            self._build_indexes()
+        first = bisect.bisect_left(self._years, start)
+        last = bisect.bisect_right(self._years, end)
+        return [self._books[book_id] for year in self._years[first:last] for book_id in self._year_index[year]]
+
+    # Метод для преобразования границ диапазона годов в числа.
+    @staticmethod
+    def _year_range(start, end):
+        if end is None:
+            end = start
+        first, last = parse_year(start), parse_year(end)
+        if first is None or last is None:
+            raise ValueError(f"Некорректный диапазон годов: {start}-{end}")
+        return first, last
+
+    # Метод для добавления книги в индекс по статусу.
+    def _index_status(self, book):
+        if self._status_index is None:
+            return
+        book_ids = self._status_index.get(book.status)
+        if book_ids is None:
+            # Словарь используется как упорядоченное множество ID книг.
+            book_ids = self._status_index[book.status] = {}
+        book_ids[book.book_id] = None
+
+    # Метод для удаления книги из индекса по статусу.
+    def _unindex_status(self, book):
+        if self._status_index is None:
+            return
+        book_ids = self._status_index[book.status]
+        del book_ids[book.book_id]
+        if not book_ids:
+            del self._status_index[book.status]
+
+    # Метод для получения книг с указанным статусом за время, пропорциональное количеству найденных книг.
+    # Книги возвращаются в порядке, в котором они получили этот статус.
+    def books_with_status(self, status):
+        if self._status_index is None:
+            self._build_indexes()
+        return [self._books[book_id] for book_id in self._status_index.get(status, ())]
+
+    # Метод для получения книг, находящихся в библиотеке.
+    def available_books(self):
+        return self.books_with_status(STATUS_AVAILABLE)
+
+    # Метод для получения выданных книг.
+    def issued_books(self):
+        return self.books_with_status(STATUS_ISSUED)
+
+    # Метод для получения количества книг с каждым статусом без перебора книг.
+    def status_counts(self):
+        if self._status_index is None:
+            self._build_indexes()
+        return {status: len(book_ids) for status, book_ids in self._status_index.items()}
+
     # Метод для загрузки книг из файла.
     def load_books(self):
+        if self.journal:
+            # Снимок и журнал читаются под блокировкой, чтобы другой процесс не сжал журнал во время чтения.
+            with self._locked():
+                return self._replay_journal(self._read_snapshot())
+        return self._read_snapshot()
+
+    # Метод для чтения книг из файла снимка.
+    def _read_snapshot(self):
+        # Идентификатор файла запоминается до чтения: если снимок заменят после этого, следующая
+        # проверка обнаружит замену и загрузит библиотеку заново.
+        self._snapshot_stamp = self._stat_snapshot()
         try:
+            if is_binary_snapshot(self.filename):
+                # Двоичный снимок отображается в память, книги создаются при обращении к ним.
+                return SnapshotBooks(self.filename)
             with open(self.filename, 'r', encoding='utf-8') as file:
-                # Чтение данных из файла и создание объектов Book.
-                return [Book(**book) for book in json.load(file)]
+                # Потоковое чтение данных из файла и создание объектов Book без промежуточного списка словарей.
+                return list(iter_json_books(file))
         except FileNotFoundError:
             # Если файл не найден, возвращаем пустой список.
             return []
 
+    # Метод для получения идентификатора файла снимка. Снимок заменяется новым файлом при каждом сжатии,
+    # поэтому смена номера inode или времени изменения означает, что журнал был сжат другим процессом.
+    def _stat_snapshot(self):
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    # Метод для чтения записей журнала, начиная с позиции offset в байтах.
+    def _read_journal(self, offset=0):
+        if offset == 0:
+            self._journal_records = 0
+        self._journal_offset = offset
+        try:
+            with open(self.journal_filename, 'rb+') as file:
+                file.seek(offset)
+                for line in file:
+                    try:
+                        if not line.endswith(b'\n'):
+                            # Запись без перевода строки недописана, даже если её JSON полон:
+                            # следующая запись оказалась бы с ней на одной строке.
+                            raise ValueError('Недописанная запись журнала')
+                        record = json.loads(line.decode('utf-8'))
+                    except ValueError:  # В том числе UnicodeDecodeError и json.JSONDecodeError.
+                        # Недописанная последняя запись (например, после сбоя) отбрасывается,
+                        # чтобы следующие записи не оказались после повреждённой строки.
+                        # Журнал читается только под блокировкой, поэтому другой процесс не может дописывать её сейчас.
+                        file.truncate(self._journal_offset)
+                        break
+                    self._journal_offset += len(line)
+                    if record['op'] != 'checkpoint':
+                        self._journal_records += 1
+                    yield record
+        except FileNotFoundError:
+            # Если журнала нет, используется только снимок.
+            pass
+
+    # Метод для применения записей журнала к книгам, загруженным из снимка.
+    def _replay_journal(self, books):
+        self._seq = self._checkpoint = 0
+        self._versions = {}
+        # Изменения из журнала применяются к книгам двоичного снимка на месте, без загрузки всего снимка.
+        books_by_id = books if isinstance(books, SnapshotBooks) else {book.book_id: book for book in books}
+        # Применение записей идемпотентно, поэтому повторное воспроизведение журнала безопасно.
+        for record in self._read_journal():
+            if record['op'] == 'add':
+                book = Book(**record['book'])
+                books_by_id.pop(book.book_id, None)  # Заменённая книга переносится в конец каталога.
+                books_by_id[book.book_id] = book
+            elif record['op'] == 'remove':
+                books_by_id.pop(record['book_id'], None)
+            elif record['op'] == 'status' and record['book_id'] in books_by_id:
+                books_by_id[record['book_id']].status = record['status']
+            self._track_version(record)
+        return books_by_id if isinstance(books, SnapshotBooks) else list(books_by_id.values())
+
+    # Метод для применения к загруженной библиотеке записи журнала, сделанной другим процессом.
+    def _apply_record(self, record):
+        if record['op'] == 'add':
+            book = Book(**record['book'])
+            old = self.get_book(book.book_id)
+            if old is not None:
+                self._remove(old)
+            self._insert(book)
+        elif record['op'] in ('remove', 'status'):
+            book = self.get_book(record['book_id'])
+            if book is not None and record['op'] == 'remove':
+                self._remove(book)
+            elif book is not None:
+                self._set_status(book, record['status'])
+        self._track_version(record)
+
+    # Метод для учёта номера изменения и версии книги из записи журнала.
+    def _track_version(self, record):
+        if record['op'] == 'checkpoint':
+            # Запись в начале журнала после сжатия: номер последнего изменения и версии книг снимка.
+            # В журналах, записанных до сохранения версий при сжатии, все книги снимка получают версию этого изменения.
+            self._seq = record['seq']
+            self._checkpoint = record.get('version', record['seq'])
+            self._versions = dict(record.get('versions', ()))
+            return
+        self._seq = record.get('seq', self._seq + 1)
+        if record['op'] == 'add':
+            self._versions[record['book']['book_id']] = self._seq
+        elif record['op'] == 'remove':
+            self._versions.pop(record['book_id'], None)
+        else:
+            self._versions[record['book_id']] = self._seq
+
+    # Метод для получения версии книги. Версия меняется при каждом изменении книги, в том числе
+    # другим процессом, и передаётся в update_status() и remove_book() как expected_version.
+    # Возвращает None, если книги нет.
+    def get_version(self, book_id):
+        if self.get_book(book_id) is None:
+            return None
+        return self._versions.get(book_id, self._checkpoint)
+
+    # Метод для проверки, что книга не изменилась после того, как вызывающий код прочитал её версию.
+    def _check_version(self, book_id, expected_version):
+        if expected_version is not None:
+            version = self.get_version(book_id)
+            if version != expected_version:
+                raise StaleVersionError(
+                    f"Книга с ID {book_id} изменена: версия {version}, ожидалась {expected_version}")
+
+    # Метод для применения изменений, сделанных другими процессами после загрузки библиотеки.
+    # Читается только новая часть журнала; файл библиотеки загружается заново, только если журнал был сжат.
+    def refresh(self):
+        if self.journal:
+            with self._locked():
+                self._refresh()
+
+    def _refresh(self):
+        if self._stat_snapshot() != self._snapshot_stamp:
+            self.books = self.load_books()
+            return
+        for record in self._read_journal(self._journal_offset):
+            self._apply_record(record)
+
+    # Контекстный менеджер блокировки файла библиотеки между процессами (flock на файле <filename>.lock).
+    # Вложенные блоки используют уже полученную блокировку.
+    @contextlib.contextmanager
+    def _locked(self):
+        if self._lock_fd is not None or fcntl is None:
+            yield
+            return
+        fd = os.open(self.filename + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            self._lock_fd = fd
+            yield
+        finally:
+            self._lock_fd = None
+            os.close(fd)  # Закрытие файла снимает блокировку.
+
+    # Контекстный менеджер для изменения библиотеки. В режиме журнала удерживает блокировку файла
+    # и перед изменением применяет записи, добавленные в журнал другими процессами,
+    # поэтому изменения проверяются по актуальному состоянию и не теряются.
+    @contextlib.contextmanager
+    def _transaction(self):
+        if self._lock_fd is not None or not self.journal:
+            yield
+            return
+        with self._locked():
+            self._refresh()
+            yield
+
     # Метод для сохранения книг в файл.
     def save_books(self):
-        with open(self.filename, 'w', encoding='utf-8') as file:
+        if self.journal:
+            # В режиме журнала сохранение означает сжатие журнала в новый снимок.
+            self.compact()
+            return
+        with self._locked():
             # Запись данных книг в файл в формате JSON.
-            json.dump([book.__dict__ for book in self.books], file, ensure_ascii=False, indent=4)
+            self._write_snapshot(self._books.values())
+
+    # Метод для сжатия журнала: запись полного снимка и очистка журнала.
+    def compact(self):
+        with self._transaction():
+            self._write_snapshot(self.iter_books())
+            self._reset_journal()
+
+    # Метод для потоковой записи снимка книг во временный файл с атомарной заменой файла библиотеки.
+    # Формат снимка определяется расширением файла библиотеки: .lbs - двоичный снимок, иначе JSON.
+    def _write_snapshot(self, books):
+        temp_filename = self.filename + '.tmp'
+        binary = is_binary_snapshot(self.filename)
+        with open(temp_filename, 'wb' if binary else 'w', encoding=None if binary else 'utf-8') as file:
+            if binary:
+                write_binary_snapshot(file, books)
+            else:
+                write_json_books(file, books)
+            file.flush()
+            os.fsync(file.fileno())
+            self.bytes_written += os.fstat(file.fileno()).st_size
+        os.replace(temp_filename, self.filename)  # Снимок подменяется атомарно.
+
+    # Метод для очистки журнала после записи снимка.
+    def _reset_journal(self):
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+        # Журнал очищается только после того, как новый снимок записан на диск.
+        # Первой записью нового журнала сохраняются номер последнего изменения, чтобы номера продолжали расти,
+        # и версии книг, чтобы сжатие не меняло версии, уже прочитанные другими сеансами.
+        # Версии записываются парами [ID, версия], так как ключи JSON объекта - только строки.
+        line = json.dumps({'op': 'checkpoint', 'seq': self._seq, 'version': self._checkpoint,
+                           'versions': list(self._versions.items())}, ensure_ascii=False) + '\n' if self._seq else ''
+        with open(self.journal_filename, 'w', encoding='utf-8') as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        self._journal_offset = len(line)
+        self._journal_records = 0
+        self._snapshot_stamp = self._stat_snapshot()
+
+    # Метод, определяющий, пора ли сжимать журнал. Журнал сжимается, когда становится
+    # сопоставим по размеру с каталогом, поэтому стоимость сжатия распределяется по всем операциям.
+    def _journal_full(self):
+        return self._journal_records >= max(self.journal_limit, len(self._books))
+
+    # Метод для фиксации изменения. Каждое изменение получает следующий номер, который становится версией книги.
+    # Внутри batch() изменения накапливаются до выхода из блока.
+    def _commit(self, record):
+        record['seq'] = self._seq + 1
+        self._track_version(record)
+        if self._batch_records is not None:
+            # Без журнала (JSON файл, SQLite) сами записи не нужны: при выходе из блока библиотека
+            # сохраняется целиком, поэтому хранится только первая запись, чтобы память не росла с числом изменений.
+            if self.journal or not self._batch_records:
+                self._batch_records.append(record)
+        else:
+            self._write_records([record])
+
+    # Метод для записи изменений: в журнал или полным сохранением файла.
+    def _write_records(self, records):
+        if not self.journal:
+            self.save_books()  # Сохранение обновленного списка книг в файл.
+            return
+        with self._transaction():
+            if self._journal_file is None:
+                self._journal_file = open(self.journal_filename, 'a', encoding='utf-8')
+            data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+            self._journal_file.write(data)
+            self._journal_file.flush()
+            os.fsync(self._journal_file.fileno())  # Запись считается выполненной только после сброса на диск.
+            size = len(data.encode('utf-8'))
+            self._journal_offset += size
+            self.bytes_written += size
+            self._journal_records += len(records)
+            if self._journal_full():
+                self.compact()
+
+    # Контекстный менеджер для группы изменений: сохранение откладывается до выхода из блока
+    # и выполняется один раз. Изменения, сделанные до ошибки внутри блока, тоже сохраняются.
+    # В режиме журнала блокировка файла удерживается до конца блока.
+    @contextlib.contextmanager
+    def batch(self):
+        if self._batch_records is not None:
+            # Вложенный блок объединяется с внешним.
+            yield self
+            return
+        with self._transaction():
+            try:
+                with self._collect_records() as records:
+                    yield self
+            finally:
+                if records:
+                    self._write_records(records)
+
+    # Контекстный менеджер для применения изменений без сохранения: записи изменений, сделанных
+    # внутри блока, накапливаются в выдаваемом списке, а сохраняет их вызывающий код методом _write_records().
+    @contextlib.contextmanager
+    def _collect_records(self):
+        records = self._batch_records = []
+        try:
+            yield records
+        finally:
+            self._batch_records = None
+
+    # Метод для закрытия файла журнала.
+    def close(self):
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
 
     # Метод для добавления новой книги в библиотеку.
     def add_book(self, book_id, title, author, year, status="В наличии"):
         book = Book(book_id, title, author, year, status)  # Создание нового объекта Book.
-        self.books.append(book)  # Добавление книги в список книг.
-        self.save_books()  # Сохранение обновленного списка книг в файл.
+        with self._transaction():
+            self._insert(book)  # Добавление книги в хранилище и индексы.
+            self._commit({'op': 'add', 'book': book.to_dict()})
         print(f"\nКнига '{title}' добавлена с ID {book.book_id}\n")
 
     # Метод для удаления книги из библиотеки по ID.
-    def remove_book(self, book_id):
-        if any(book.book_id == book_id for book in self.books):
-            # Если книга с указанным ID существует, удаляем её.
-            self.books = [book for book in self.books if book.book_id != book_id]
-            self.save_books()  # Сохранение обновленного списка книг в файл.
-            print(f"Книга с ID {book_id} удалена\n")
-        else:
-            # Если книга с указанным ID не найдена, выводим сообщение об ошибке.
-            print(f"\nКнига с ID {book_id} не найдена\n")
+    # Если указана expected_version, а книга уже изменена, возникает StaleVersionError.
+    def remove_book(self, book_id, expected_version=None):
+        with self._transaction():
+            book = self.get_book(book_id)
+            if book is not None:
+                # Если книга с указанным ID существует, удаляем её.
+                self._check_version(book_id, expected_version)
+                self._remove(book)
+                self._commit({'op': 'remove', 'book_id': book_id})
+                print(f"Книга с ID {book_id} удалена\n")
+            else:
+                # Если книга с указанным ID не найдена, выводим сообщение об ошибке.
+                print(f"\nКнига с ID {book_id} не найдена\n")
 
     # Метод для поиска книг по названию или автору.
     def find_book(self):
@@ -65,56 +1633,737 @@ class Library:
         print('1. По названию.')
         print('2. По имени автора.')
         print('3. По году издания.')
+        print('4. По названию или автору с опечатками.')
 
         choice = input('\nВыберите действие:\n')
         results = []
 
         if choice == '1':
             search_term = input('\nВведите название книги.\n')
-            results = [book for book in self.books if search_term.lower() in book.title.lower()]
+            results = self.search('title', search_term)
         elif choice == '2':
             search_term = input('\nВведите автора книги.\n')
-            results = [book for book in self.books if search_term.lower() in book.author.lower()]
+            results = self.search('author', search_term)
         elif choice == '3':
             search_term = input('\nВведите год издания.\n')
-            results = [book for book in self.books if search_term.lower() in book.year]
+            year = parse_year(search_term)
+            # Поиск ведётся по точному году через индекс, а не по вхождению подстроки.
+            results = self.books_by_year(year) if year is not None else []
+        elif choice == '4':
+            field = 'author' if input('\n1. В названии.\n2. В имени автора.\n').strip() == '2' else 'title'
+            search_term = input('\nВведите запрос, допускаются опечатки.\n')
+            results = self.fuzzy_search(field, search_term)
 
         return results
 
     # Метод для отображения всех книг в библиотеке.
-    def display_books(self):
-        if not self.books:
+    # Таблица строится только для одной страницы, поэтому время отображения не зависит от размера каталога.
+    def display_books(self, page=1, page_size=DEFAULT_PAGE_SIZE):
+        if next(self.iter_books(0, 1), None) is None:
             # Если файла библиотеки нет, то будет отображено сообщение об ошибке
             print('\nБиблиотека не найдена.')
-        else:
-            print('\nСписок всех книг библиотеки:')
-            all_books_table = PrettyTable()  # Используем библиотеку prettytable для красивого отображения библиотеки в виде таблицы
-            all_books_table.field_names = ["ID", "Название книги", "Автор", "Год издания", "Статус"]  # Имена полей таблицы
-            for book in self.books:
-                # Добавление информации о каждой книге в таблицу.
-                all_books_table.add_row([book.book_id, book.title, book.author, book.year, book.status])
-            return all_books_table  # Вывод таблицы в терминал.
+            return None
+        books = list(self.iter_books((page - 1) * page_size, page * page_size)) if page >= 1 else []
+        if not books:
+            print(f'\nСтраница {page} не найдена.')
+            return None
+        print('\nСписок всех книг библиотеки:')
+        return make_table(books)  # Вывод таблицы в терминал.
 
     # Метод для обновления статуса книги по ID.
-    def update_status(self, book_id, new_status):
-        for book in self.books:
-            if book.book_id == book_id:
-                # Если книга с указанным ID найдена - обновляем её статус.
-                if book.status != new_status:
-                    book.status = new_status
-                    print(f"\nСтатус книги с ID {book_id} обновлен на '{new_status}'\n")
-                else:
-                    # Если книга с указанным ID не найдена - выводим соответствующее сообщение.
-                    print(f"\nСтатус книги с ID {book_id} уже соответствует статусу '{new_status}'\n")
-                self.save_books()  # Сохранение обновленного списка книг в файл.
+    # Если указана expected_version, а книга уже изменена, возникает StaleVersionError.
+    def update_status(self, book_id, new_status, expected_version=None):
+        with self._transaction():
+            book = self.get_book(book_id)  # Поиск книги по индексу за O(1).
+            if book is None:
+                # Если книга с указанным ID не найдена, выводим сообщение об ошибке.
+                print(f"Книга с ID {book_id} не найдена")
                 return
-        # Если книга с указанным ID не найдена, выводим сообщение об ошибке.
-        print(f"Книга с ID {book_id} не найдена")
+            self._check_version(book_id, expected_version)
+            if book.status != new_status:
+                # Если книга с указанным ID найдена - обновляем её статус.
+                self._set_status(book, new_status)
+                self._commit({'op': 'status', 'book_id': book_id, 'status': new_status})
+                print(f"\nСтатус книги с ID {book_id} обновлен на '{new_status}'\n")
+            else:
+                # Если статус книги уже совпадает с новым - выводим соответствующее сообщение.
+                # Изменения нет, поэтому версия книги не меняется.
+                print(f"\nСтатус книги с ID {book_id} уже соответствует статусу '{new_status}'\n")
+
+    # Метод для преобразования словаря или объекта Book в Book с проверкой обязательных полей.
+    @staticmethod
+    def _to_book(item):
+        if isinstance(item, BookRow):
+            item = item.to_dict()
+        if not isinstance(item, Book):
+            unknown = set(item) - set(BOOK_FIELDS)
+            if unknown:
+                raise ValueError(f"Неизвестные поля книги: {', '.join(sorted(unknown))}")
+            try:
+                item = Book(**item)
+            except TypeError:
+                raise ValueError(f"Не указаны обязательные поля книги: {item}") from None
+        if item.book_id in (None, '') or not item.title or not item.author:
+            raise ValueError(f"У книги должны быть указаны ID, название и автор: {item.to_dict()}")
+        return item
+
+    # Метод для добавления нескольких книг. Все книги проверяются до изменения библиотеки,
+    # а сохранение выполняется один раз. Возвращает количество добавленных книг.
+    def add_books(self, books):
+        books = [self._to_book(book) for book in books]
+        book_ids = [book.book_id for book in books]
+        if len(set(book_ids)) != len(book_ids):
+            raise ValueError("ID добавляемых книг повторяются")
+        with self.batch():
+            # Проверка выполняется внутри блока, то есть по актуальному состоянию с учётом других процессов.
+            existing = self._get_books(book_ids)
+            if existing:
+                raise ValueError(f"Книги с ID уже есть в библиотеке: {', '.join(map(str, existing))}")
+            for book in books:
+                self._insert(book)
+                self._commit({'op': 'add', 'book': book.to_dict()})
+        return len(books)
+
+    # Метод для удаления нескольких книг по ID с одним сохранением. Возвращает количество удалённых книг.
+    def remove_books(self, book_ids):
+        book_ids = list(dict.fromkeys(book_ids))  # Повторяющиеся ID удаляются с сохранением порядка.
+        with self.batch():
+            books = self._get_books(book_ids)
+            missing = [book_id for book_id in book_ids if book_id not in books]
+            if missing:
+                raise ValueError(f"Книги с ID не найдены: {', '.join(map(str, missing))}")
+            for book_id in book_ids:
+                self._remove(books[book_id])
+                self._commit({'op': 'remove', 'book_id': book_id})
+        return len(book_ids)
+
+    # Метод для изменения статусов нескольких книг по словарю "ID -> статус" с одним сохранением.
+    # Возвращает количество книг, статус которых изменился.
+    def update_statuses(self, statuses):
+        statuses = dict(statuses)
+        if not all(isinstance(status, str) and status for status in statuses.values()):
+            raise ValueError("Статус книги должен быть непустой строкой")
+        changed = 0
+        with self.batch():
+            books = self._get_books(statuses)
+            missing = [book_id for book_id in statuses if book_id not in books]
+            if missing:
+                raise ValueError(f"Книги с ID не найдены: {', '.join(map(str, missing))}")
+            for book_id, status in statuses.items():
+                book = books[book_id]
+                if book.status != status:
+                    self._set_status(book, status)
+                    self._commit({'op': 'status', 'book_id': book_id, 'status': status})
+                    changed += 1
+        return changed
+
+    # Метод для потокового импорта книг из CSV или JSONL файла. Книги добавляются частями
+    # по chunk_size строк, а сохранение выполняется один раз после импорта.
+    # Если в строке нет ID или статуса, создаётся новый ID и статус "В наличии".
+    def import_books(self, filename, file_format=None, chunk_size=10000):
+        file_format = file_format or file_format_of(filename)
+        count = 0
+        with open(filename, 'r', encoding='utf-8', newline='') as file:
+            if file_format == 'csv':
+                rows = csv.DictReader(file)
+            else:
+                rows = (json.loads(line) for line in file if line.strip())
+            with self.batch():
+                chunk = []
+                for row in rows:
+                    book = {field: row[field] for field in BOOK_FIELDS if row.get(field) not in (None, '')}
+                    book.setdefault('book_id', str(uuid.uuid4()))
+                    chunk.append(book)
+                    if len(chunk) == chunk_size:
+                        count += self.add_books(chunk)
+                        chunk = []
+                count += self.add_books(chunk)
+        return count
+
+    # Метод для потокового экспорта всех книг в CSV или JSONL файл. Возвращает количество книг.
+    def export_books(self, filename, file_format=None):
+        file_format = file_format or file_format_of(filename)
+        count = 0
+        with open(filename, 'w', encoding='utf-8', newline='') as file:
+            if file_format == 'csv':
+                writer = csv.writer(file)
+                writer.writerow(BOOK_FIELDS)
+                for book in self.iter_books():
+                    writer.writerow([getattr(book, field) for field in BOOK_FIELDS])
+                    count += 1
+            else:
+                for book in self.iter_books():
+                    file.write(json.dumps(book.to_dict(), ensure_ascii=False) + '\n')
+                    count += 1
+        return count
+
+
+class LazyLibrary(Library):
+    """
+        Класс LazyLibrary работает с JSON файлом библиотеки, не загружая его в память.
+        Книги читаются из файла потоково, а изменения записываются в журнал и хранятся
+        в памяти до сжатия, поэтому размер каталога может превышать объём оперативной памяти.
+        Параметры совпадают с параметрами Library: journal=True допускается, так как журнал ведётся всегда,
+        а режимы без журнала и хранения по столбцам в этом режиме не поддерживаются.
+    """
+    def __init__(self, filename='library.json', journal=True, journal_limit=1000, backend='json', path=None,
+                 columnar=False, cache_size=SEARCH_CACHE_SIZE, lazy=True):
+        if not journal:
+            raise ValueError("Ленивый режим всегда записывает изменения в журнал, journal=False не поддерживается")
+        if columnar:
+            raise ValueError("Ленивый режим не хранит каталог в памяти, columnar=True не поддерживается")
+        if path is not None:
+            filename = path
+        self.filename = filename  # Имя файла для хранения данных библиотеки.
+        self.columnar = False  # Каталог не хранится в памяти.
+        self.journal = True  # Изменения в этом режиме всегда записываются в журнал.
+        self.journal_filename = filename + '.journal'  # Имя файла журнала изменений.
+        self.journal_limit = journal_limit  # Число записей журнала, после которого выполняется сжатие.
+        self._journal_file = None  # Открытый на дозапись файл журнала.
+        self._journal_records = 0  # Количество записей в журнале с момента последнего сжатия.
+        self._journal_offset = 0  # Размер уже прочитанной части журнала в байтах.
+        self._snapshot_stamp = None  # Идентификатор файла снимка, к которому относится журнал.
+        self._versions = {}  # Версии книг, изменённых после снимка: ID -> номер изменения.
+        self._changed = {}  # Добавленные или заменённые книги по ID; None означает удалённую книгу.
+        self._statuses = {}  # Новые статусы книг из файла, изменённых после последнего сжатия.
+        self._init_search_cache(cache_size)
+        with self._locked():
+            self._load_journal()
+
+    # Метод для чтения всего журнала в изменения, хранящиеся в памяти.
+    def _load_journal(self):
+        self._snapshot_stamp = self._stat_snapshot()
+        self._seq = self._checkpoint = 0
+        self._versions = {}
+        self._changed = {}
+        self._statuses = {}
+        self.clear_search_cache()
+        for record in self._read_journal():
+            self._apply_record(record)
+
+    # Метод для применения записи журнала к изменениям в памяти без чтения файла библиотеки.
+    def _apply_record(self, record):
+        if record['op'] == 'add':
+            book = Book(**record['book'])
+            self._changed.pop(book.book_id, None)  # Заменённая книга переносится в конец каталога.
+            self._changed[book.book_id] = book
+            self._statuses.pop(book.book_id, None)
+        elif record['op'] == 'remove':
+            self._changed[record['book_id']] = None
+            self._statuses.pop(record['book_id'], None)
+        elif record['op'] == 'status':
+            self._apply_status(record['book_id'], record['status'])
+        self._track_version(record)
+
+    # Если журнал был сжат другим процессом, изменения в памяти уже содержатся в новом снимке
+    # и журнал читается с начала, иначе читается только его новая часть.
+    # Для записей других процессов старые данные книги неизвестны без чтения файла, поэтому кэш поиска очищается.
+    def _refresh(self):
+        if self._stat_snapshot() != self._snapshot_stamp:
+            self._load_journal()
+            return
+        changed = False
+        for record in self._read_journal(self._journal_offset):
+            self._apply_record(record)
+            changed = True
+        if changed:
+            self.clear_search_cache()
+
+    # Метод для запоминания нового статуса книги до сжатия журнала.
+    def _apply_status(self, book_id, status):
+        if book_id in self._changed:
+            if self._changed[book_id] is not None:
+                self._changed[book_id].status = status
+        else:
+            self._statuses[book_id] = status
+
+    # Метод для потокового чтения книг из файла без учёта изменений из журнала.
+    def _iter_file(self):
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as file:
+                yield from iter_json_books(file)
+        except FileNotFoundError:
+            # Если файл не найден, библиотека пуста.
+            return
+
+    # Книги читаются из файла по мере перебора, с учётом изменений из журнала.
+    def iter_books(self, start=0, stop=None):
+        return itertools.islice(self._iter_merged(), start, stop)
+
+    # Метод для перебора книг из файла с применением изменений из журнала.
+    # Количество прочитанных книг учитывается в books_scanned, когда перебор завершён или прерван.
+    def _iter_merged(self):
+        scanned = 0
+        try:
+            for book in self._iter_file():
+                scanned += 1
+                if book.book_id in self._changed:
+                    # Удалённая или заменённая книга; заменённая книга идёт в конце, как в остальных режимах.
+                    continue
+                if book.book_id in self._statuses:
+                    book.status = self._statuses[book.book_id]
+                yield book
+            # Книги, добавленные или заменённые после последнего сжатия, идут в конце.
+            for book in self._changed.values():
+                if book is not None:
+                    scanned += 1
+                    yield book
+        finally:
+            self.books_scanned += scanned
+
+    # Свойство со всеми книгами библиотеки. Загружает весь каталог в память.
+    @property
+    def books(self):
+        return tuple(self.iter_books())
+
+    # Присваивание списка книг записывает новый файл библиотеки.
+    @books.setter
+    def books(self, books):
+        with self._locked():
+            self._write_snapshot(books)
+            # Каталог заменён целиком, поэтому все книги получают версию последнего изменения.
+            self._checkpoint, self._versions = self._seq, {}
+            self._reset_journal()
+        self.clear_search_cache()
+
+    # Количество книг считается проходом по файлу.
+    def __len__(self):
+        return sum(1 for _ in self.iter_books())
+
+    # Поиск книги по ID проходом по файлу.
+    def get_book(self, book_id):
+        if book_id in self._changed:
+            return self._changed[book_id]
+        return next((book for book in self.iter_books() if book.book_id == book_id), None)
+
+    def _insert(self, book):
+        if self._search_cache:
+            if book.book_id in self._changed:
+                old = self._changed[book.book_id]
+                if old is not None:
+                    self._invalidate_search(old)
+                self._invalidate_search(book)
+            else:
+                # Заменяемая книга может быть только в файле: её старые данные неизвестны без прохода по файлу,
+                # поэтому кэш поиска очищается, как и для записей других процессов.
+                self.clear_search_cache()
+        self._changed.pop(book.book_id, None)  # Заменённая книга переносится в конец каталога.
+        self._changed[book.book_id] = book
+        self._statuses.pop(book.book_id, None)
+
+    def _remove(self, book):
+        self._invalidate_search(book)
+        self._changed[book.book_id] = None
+        self._statuses.pop(book.book_id, None)
+
+    # Поиск нескольких книг за один проход по файлу.
+    def _get_books(self, book_ids):
+        book_ids = set(book_ids)
+        if not book_ids:
+            return {}
+        return {book.book_id: book for book in self.iter_books() if book.book_id in book_ids}
+
+    # Книги читаются из файла заново при каждом переборе, поэтому в кэше поиска хранятся копии
+    # и результаты с этой книгой удаляются из кэша.
+    def _set_status(self, book, status):
+        self._invalidate_search(book)
+        book.status = status
+        self._apply_status(book.book_id, status)
+
+    # Поиск проходом по файлу с той же семантикой, что и у инвертированного индекса.
+    def _search(self, field, terms, limit):
+        results = []
+        for book in self.iter_books():
+            if matches_terms(getattr(book, field), terms):
+                results.append(book)
+                if len(results) == limit:
+                    break
+        return results
+
+    # Нечёткий поиск проходом по файлу: слова каждой книги сравниваются со словами запроса
+    # по ограниченному расстоянию Левенштейна, порядок результатов тот же, что у индекса.
+    def _fuzzy_search(self, field, terms, distances, limit):
+        queries = [(term, trigrams(term), distance) for term, distance in zip(terms, distances)]
+        results = []
+        for number, book in enumerate(self.iter_books()):
+            tokens = set(tokenize(getattr(book, field)))
+            score = [0, 0]  # Сумма расстояний и сумма сходства с обратным знаком.
+            for term, grams, distance in queries:
+                best = None
+                for token in tokens:
+                    token_distance = bounded_levenshtein(term, token, distance)
+                    if token_distance is not None:
+                        token_grams = trigrams(token)
+                        match = (token_distance, -len(grams & token_grams) / len(grams | token_grams))
+                        if best is None or match < best:
+                            best = match
+                if best is None:
+                    break
+                score[0] += best[0]
+                score[1] += best[1]
+            else:
+                results.append((score, number, book))
+        results.sort(key=lambda result: result[:2])
+        return [book for score, number, book in results[:limit]]
+
+    # Поиск по диапазону годов проходом по файлу.
+    def books_by_year(self, start, end=None):
+        start, end = self._year_range(start, end)
+        results = []
+        for book in self.iter_books():
+            year = parse_year(book.year)
+            if year is not None and start <= year <= end:
+                results.append((year, book))
+        results.sort(key=lambda result: result[0])
+        return [book for year, book in results]
+
+    # Поиск по статусу проходом по файлу: индекс статусов всего каталога в этом режиме не хранится в памяти.
+    def books_with_status(self, status):
+        return [book for book in self.iter_books() if book.status == status]
+
+    # Подсчёт книг по статусам проходом по файлу.
+    def status_counts(self):
+        counts = {}
+        for book in self.iter_books():
+            counts[book.status] = counts.get(book.status, 0) + 1
+        return counts
+
+    def load_books(self):
+        return list(self.iter_books())
+
+    # Журнал сжимается по числу записей, чтобы ограничить объём изменений в памяти.
+    def _journal_full(self):
+        return self._journal_records >= self.journal_limit
+
+    def _reset_journal(self):
+        super()._reset_journal()
+        # Все изменения теперь содержатся в файле библиотеки.
+        self._changed = {}
+        self._statuses = {}
+
+
+class SqliteLibrary(Library):
+    """
+        Класс SqliteLibrary хранит книги в базе данных SQLite и не загружает каталог в память.
+    """
+    backend = 'sqlite'
+
+    def __init__(self, path='library.db', backend='sqlite', cache_size=SEARCH_CACHE_SIZE):
+        self.filename = path  # Путь к файлу базы данных.
+        self.journal = False  # Журнал изменений ведёт сама база данных.
+        self._init_search_cache(cache_size)
+        self._data_version = None  # Значение PRAGMA data_version, при котором заполнялся кэш поиска.
+        self._trigram_index = None  # Триграммные индексы словарей полей, строятся при первом нечётком поиске.
+        self._trigram_version = None  # Значение PRAGMA data_version, при котором строились триграммные индексы.
+        # Сервис библиотеки фиксирует транзакции в отдельном потоке, поэтому соединение не привязано к потоку.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        counted = self._connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'status_counts'").fetchone() is not None
+        fts = self._connection.execute("SELECT sql FROM sqlite_master WHERE name = 'books_fts'").fetchone()
+        reindex = fts is not None and FTS_TOKENIZER not in fts[0]
+        if reindex:
+            # База, полнотекстовый индекс которой создан с другим токенизатором, индексируется заново.
+            self._connection.execute('DROP TABLE IF EXISTS books_vocab')
+            self._connection.execute('DROP TABLE books_fts')
+        # Режим WAL позволяет читать базу во время записи и ускоряет фиксацию транзакций.
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        # Столбцы book_id и year объявлены без типа, чтобы значения сохранялись без преобразования.
+        # В year_number хранится год в виде числа для индекса и диапазонных запросов,
+        # в version - номер версии книги, который увеличивается при каждом изменении.
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS books (
+                book_id PRIMARY KEY,
+                title TEXT NOT NULL,
+                author TEXT NOT NULL,
+                year,
+                status TEXT NOT NULL,
+                year_number INTEGER,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS books_author ON books (author);
+            CREATE INDEX IF NOT EXISTS books_year_number ON books (year_number);
+            CREATE INDEX IF NOT EXISTS books_status ON books (status);
+            -- Полнотекстовый индекс хранит нормализованные название и автора (с заменой "ё" на "е").
+            CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5 (title, author, tokenize="%s");
+            -- Словарь полнотекстового индекса по полям, из него строятся триграммные индексы нечёткого поиска.
+            CREATE VIRTUAL TABLE IF NOT EXISTS books_vocab USING fts5vocab (books_fts, col);
+            -- Количество книг с каждым статусом поддерживается триггерами при каждом изменении таблицы books.
+            CREATE TABLE IF NOT EXISTS status_counts (status TEXT PRIMARY KEY, count INTEGER NOT NULL);
+            CREATE TRIGGER IF NOT EXISTS books_status_insert AFTER INSERT ON books BEGIN
+                INSERT INTO status_counts VALUES (new.status, 1)
+                    ON CONFLICT (status) DO UPDATE SET count = count + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS books_status_delete AFTER DELETE ON books BEGIN
+                UPDATE status_counts SET count = count - 1 WHERE status = old.status;
+            END;
+            CREATE TRIGGER IF NOT EXISTS books_status_update AFTER UPDATE OF status ON books
+                WHEN old.status != new.status BEGIN
+                UPDATE status_counts SET count = count - 1 WHERE status = old.status;
+                INSERT INTO status_counts VALUES (new.status, 1)
+                    ON CONFLICT (status) DO UPDATE SET count = count + 1;
+            END;
+        """ % FTS_TOKENIZER)
+        if reindex:
+            for rowid, title, author in self._connection.execute('SELECT rowid, title, author FROM books').fetchall():
+                self._connection.execute('INSERT INTO books_fts (rowid, title, author) VALUES (?, ?, ?)',
+                                         (rowid, normalize(title), normalize(author)))
+        if not counted:
+            # База, созданная до появления счётчиков статусов.
+            self._connection.execute('DELETE FROM status_counts')
+            self._connection.execute(
+                'INSERT INTO status_counts SELECT status, COUNT(*) FROM books GROUP BY status')
+        columns = [row[1] for row in self._connection.execute('PRAGMA table_info(books)')]
+        if 'version' not in columns:
+            # База, созданная до появления версий книг.
+            self._connection.execute('ALTER TABLE books ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        self._connection.commit()
+
+    # Свойство со всеми книгами библиотеки. Загружает весь каталог, поэтому для больших баз
+    # следует использовать iter_books(), search() и books_by_year().
+    @property
+    def books(self):
+        return tuple(self.iter_books())
+
+    # Присваивание списка книг заменяет содержимое базы.
+    @books.setter
+    def books(self, books):
+        self.clear_search_cache()
+        self._trigram_index = None
+        self._connection.execute('DELETE FROM books')
+        self._connection.execute('DELETE FROM books_fts')
+        for book in books:
+            self._insert(book)
+        self._connection.commit()
+
+    # Количество книг считается запросом к базе.
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM books').fetchone()[0]
+
+    # Метод для создания объекта Book из строки таблицы.
+    @staticmethod
+    def _row_to_book(row):
+        return Book(*row)
+
+    # Книги читаются из базы по мере перебора.
+    def iter_books(self, start=0, stop=None):
+        rows = self._connection.execute(
+            'SELECT book_id, title, author, year, status FROM books ORDER BY rowid LIMIT ? OFFSET ?',
+            (-1 if stop is None else max(stop - start, 0), start))
+        return map(self._row_to_book, rows)
+
+    # Поиск книги по первичному ключу book_id.
+    def get_book(self, book_id):
+        row = self._connection.execute(
+            'SELECT book_id, title, author, year, status FROM books WHERE book_id = ?', (book_id,)).fetchone()
+        return self._row_to_book(row) if row is not None else None
+
+    def _insert(self, book):
+        # Добавление или замена книги с тем же ID, как в словаре книг базового класса.
+        # При замене версия книги продолжает расти.
+        version = self.get_version(book.book_id)
+        if version is not None and self._search_cache:
+            self._invalidate_search(self.get_book(book.book_id))
+        self._remove(book)
+        if self._trigram_index is not None:
+            # Новые слова сразу попадают в триграммные индексы. Слова удалённых книг остаются в них
+            # до перестроения: поиск по ним просто не находит книг.
+            for field, index in self._trigram_index.items():
+                for token in tokenize(getattr(book, field)):
+                    index.add(token)
+        cursor = self._connection.execute(
+            'INSERT INTO books (book_id, title, author, year, status, year_number, version) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (book.book_id, book.title, book.author, book.year, book.status, parse_year(book.year),
+             0 if version is None else version + 1))
+        self._connection.execute(
+            'INSERT INTO books_fts (rowid, title, author) VALUES (?, ?, ?)',
+            (cursor.lastrowid, normalize(book.title), normalize(book.author)))
+
+    def _remove(self, book):
+        self._invalidate_search(book)
+        self._connection.execute(
+            'DELETE FROM books_fts WHERE rowid IN (SELECT rowid FROM books WHERE book_id = ?)', (book.book_id,))
+        self._connection.execute('DELETE FROM books WHERE book_id = ?', (book.book_id,))
+
+    # Поиск нескольких книг запросами с IN по частям, чтобы не превысить лимит параметров SQLite.
+    def _get_books(self, book_ids):
+        book_ids = list(book_ids)
+        books = {}
+        for start in range(0, len(book_ids), 500):
+            chunk = book_ids[start:start + 500]
+            rows = self._connection.execute(
+                'SELECT book_id, title, author, year, status FROM books WHERE book_id IN '
+                f'({", ".join("?" * len(chunk))})', chunk)
+            books.update((row[0], self._row_to_book(row)) for row in rows)
+        return books
+
+    # Результаты поиска содержат копии строк базы, поэтому результаты с этой книгой удаляются из кэша.
+    def _set_status(self, book, status):
+        self._invalidate_search(book)
+        self._connection.execute(
+            'UPDATE books SET status = ?, version = version + 1 WHERE book_id = ?', (status, book.book_id))
+        book.status = status
+
+    # Версия книги хранится в базе и увеличивается при каждом изменении книги.
+    def get_version(self, book_id):
+        row = self._connection.execute('SELECT version FROM books WHERE book_id = ?', (book_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    # Версии книг ведёт база, номера изменений не нужны.
+    def _track_version(self, record):
+        pass
+
+    # Изменение выполняется в транзакции BEGIN IMMEDIATE: блокировка записи берётся до чтения книги,
+    # поэтому проверка и изменение не перемежаются с изменениями других процессов.
+    # Транзакция фиксируется и при ошибке, чтобы сохранить изменения, сделанные до неё (как в batch()).
+    @contextlib.contextmanager
+    def _transaction(self):
+        if self._connection.in_transaction:
+            yield
+            return
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        finally:
+            if self._connection.in_transaction:
+                self._connection.commit()
+
+    # Перед поиском проверяется, не изменяли ли базу другие соединения: значение PRAGMA data_version
+    # меняется при каждой их фиксации, и тогда кэш поиска очищается.
+    def search(self, field, query, limit=None):
+        data_version = self._connection.execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self._data_version:
+            self.clear_search_cache()
+            self._data_version = data_version
+        return super().search(field, query, limit)
+
+    # Поиск по полнотекстовому индексу FTS5: каждое слово запроса ищется как префикс слова в поле.
+    def _search(self, field, terms, limit):
+        match = field + ' : (' + ' AND '.join(f'"{term}"*' for term in terms) + ')'
+        rows = self._connection.execute(
+            'SELECT b.book_id, b.title, b.author, b.year, b.status FROM books_fts f '
+            'JOIN books b ON b.rowid = f.rowid WHERE books_fts MATCH ? ORDER BY b.rowid LIMIT ?',
+            (match, -1 if limit is None else limit))
+        results = [self._row_to_book(row) for row in rows]
+        self.books_scanned += len(results)  # Полнотекстовый индекс возвращает только подходящие книги.
+        return results
+
+    # Нечёткий поиск: похожие слова ищутся по триграммным индексам словаря FTS5, которые хранятся в памяти
+    # и перестраиваются после изменения базы другими соединениями, а книги с этими словами - по FTS5.
+    def _fuzzy_search(self, field, terms, distances, limit):
+        data_version = self._connection.execute('PRAGMA data_version').fetchone()[0]
+        if self._trigram_index is None or data_version != self._trigram_version:
+            self._trigram_index = {name: TrigramIndex(term for term, in self._connection.execute(
+                'SELECT term FROM books_vocab WHERE col = ?', (name,))) for name in SEARCH_FIELDS}
+            self._trigram_version = data_version
+        index = self._trigram_index[field]
+        matches = [index.match(term, distance) for term, distance in zip(terms, distances)]
+
+        # ID книг каждого слова с их rowid в качестве позиции читаются из базы один раз.
+        @functools.cache
+        def postings(token):
+            return dict(self._connection.execute(
+                'SELECT b.book_id, b.rowid FROM books_fts f JOIN books b ON b.rowid = f.rowid '
+                'WHERE books_fts MATCH ? ORDER BY b.rowid', (f'{field} : "{token}"',)))
+
+        book_ids = rank_fuzzy_matches(matches, postings, limit)
+        self.books_scanned += len(book_ids)
+        books = self._get_books(book_ids)
+        return [books[book_id] for book_id in book_ids]
+
+    # Диапазонный запрос по индексу year_number.
+    def books_by_year(self, start, end=None):
+        start, end = self._year_range(start, end)
+        rows = self._connection.execute(
+            'SELECT book_id, title, author, year, status FROM books '
+            'WHERE year_number BETWEEN ? AND ? ORDER BY year_number, rowid', (start, end))
+        return [self._row_to_book(row) for row in rows]
+
+    # Запрос по индексу books_status.
+    def books_with_status(self, status):
+        rows = self._connection.execute(
+            'SELECT book_id, title, author, year, status FROM books WHERE status = ? ORDER BY rowid', (status,))
+        return [self._row_to_book(row) for row in rows]
+
+    # Количество книг по статусам читается из таблицы счётчиков.
+    def status_counts(self):
+        return dict(self._connection.execute('SELECT status, count FROM status_counts WHERE count > 0'))
+
+    def load_books(self):
+        return list(self.iter_books())
+
+    # Каждое изменение выполняется в отдельной транзакции, которая фиксируется при сохранении.
+    def save_books(self):
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+
+# Доступные бэкенды хранения библиотеки.
+BACKENDS = {
+    'json': Library,
+    'sqlite': SqliteLibrary,
+}
 
 
 # Основная функция для работы с библиотекой через консоль.
-def main():
-    library = Library()  # Создание объекта библиотеки.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Консольная система управления библиотекой.')
+    parser.add_argument('--backend', choices=BACKENDS, default='json', help='бэкенд хранения книг')
+    parser.add_argument('--path', help='путь к файлу библиотеки (по умолчанию library.json или library.db); '
+                                       'файл с расширением .lbs хранится в виде двоичного снимка')
+    parser.add_argument('--import', dest='import_file', metavar='FILE', help='импортировать книги из CSV или JSONL файла')
+    parser.add_argument('--export', dest='export_file', metavar='FILE', help='экспортировать книги в CSV или JSONL файл')
+    parser.add_argument('--convert', nargs=2, metavar=('SOURCE', 'TARGET'),
+                        help='преобразовать файл библиотеки между форматами JSON и двоичного снимка (.lbs)')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='собирать метрики операций и периодически дописывать их в JSONL файл')
+    parser.add_argument('--metrics-interval', type=float, default=METRICS_DUMP_INTERVAL, metavar='SECONDS',
+                        help='интервал записи метрик в файл в секундах')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='профилировать сеанс через cProfile и записать статистику в файл для pstats')
+    args = parser.parse_args(argv)
+
+    if args.profile is None:
+        run_session(args)
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        run_session(args)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        # Краткий отчёт: функции с наибольшим общим временем.
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(PROFILE_REPORT_LINES)
+
+
+# Функция для выполнения сеанса работы с библиотекой с разобранными аргументами командной строки.
+def run_session(args):
+    if args.convert:
+        # Преобразование выполняется без открытия библиотеки и запуска меню.
+        print(f"Преобразовано книг: {convert_snapshot(*args.convert)}")
+        return
+
+    if args.backend == 'json':
+        # Создание объекта библиотеки, изменения пишутся в журнал.
+        library = Library(args.path or 'library.json', journal=True)
+    else:
+        library = Library(args.path or 'library.db', backend=args.backend)
+    if args.metrics:
+        library.enable_metrics(args.metrics, args.metrics_interval)
+
+    if args.import_file or args.export_file:
+        # Импорт и экспорт выполняются без запуска меню.
+        if args.import_file:
+            print(f"Импортировано книг: {library.import_books(args.import_file)}")
+        if args.export_file:
+            print(f"Экспортировано книг: {library.export_books(args.export_file)}")
+        library.save_books()
+        library.disable_metrics()
+        library.close()
+        return
     while True:
         # Вывод меню для выбора действия.
         print('*' * 100)
@@ -125,8 +2374,10 @@ def main():
         print("4. Показать все книги")
         print("5. Изменить статус книги")
         print("6. Выйти")
+        print("7. Статистика выдачи")
         print('*' * 100)
         choice = input("\nВыберите действие:\n")
+        library.refresh()  # Применение изменений, сделанных в других запущенных копиях приложения.
 
         if choice == '1':
             # Добавление новой книги.
@@ -143,18 +2394,18 @@ def main():
             # Поиск книги по названию, автору или году издания.
             results = library.find_book()
             if results:
-                search_result_table = PrettyTable()
-                search_result_table.field_names = ["ID", "Название книги", "Автор", "Год издания", "Статус"]
-                print('\nРезультаты поиска:')
-                for book in results:
-                    search_result_table.add_row([book.book_id, book.title, book.author, book.year, book.status])
-                # Выводим результаты поиска в виде таблицы
-                print(search_result_table)
+                print(f'\nРезультаты поиска (найдено книг: {len(results)}):')
+                # Выводим результаты поиска постранично в виде таблиц
+                show_pages(iter_pages(results))
             else:
                 print("Книги не найдены")
         elif choice == '4':
-            # Отображение всех книг.
-            print(library.display_books())
+            # Постраничное отображение всех книг.
+            if next(library.iter_books(0, 1), None) is None:
+                print('\nБиблиотека не найдена.')
+            else:
+                print('\nСписок всех книг библиотеки:')
+                show_pages(library.iter_pages())
         elif choice == '5':
             # Изменение статуса книги по ID.
             book_id = input("Введите ID книги для изменения статуса:\n")
@@ -166,9 +2417,25 @@ def main():
                 new_status = 'Выдана'
             library.update_status(book_id, new_status)
         elif choice == '6':
-            library.save_books()
+            library.save_books()  # Сжатие журнала в снимок перед выходом.
+            library.disable_metrics()  # Запись последнего снимка метрик.
+            library.close()
             # Выход из программы.
             break
+        elif choice == '7':
+            # Количество книг по статусам берётся из индекса статусов без перебора каталога.
+            counts = library.status_counts()
+            print(f"\nВсего книг: {sum(counts.values())}")
+            for status, count in sorted(counts.items()):
+                print(f"{status}: {count}")
+            list_choice = input("\n1 - показать книги в наличии, 2 - показать выданные книги, "
+                                "Enter - вернуться в меню:\n").strip()
+            if list_choice in ('1', '2'):
+                books = library.available_books() if list_choice == '1' else library.issued_books()
+                if books:
+                    show_pages(iter_pages(books))
+                else:
+                    print("Книги не найдены")
         else:
             # Обработка неверного выбора.
             print("Неверный выбор, попробуйте снова")
@@ -0,0 +1,334 @@
+# HTTP/JSON сервис для работы с библиотекой по сети.
+# Один экземпляр Library живёт всё время работы сервиса: чтения выполняются из памяти,
+# а изменения от разных клиентов объединяются в группы и сохраняются одной записью на диск.
+# Запуск из корня проекта: python library_server.py --port 8080
+import argparse
+import asyncio
+import json
+import uuid
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from library_manage import BACKENDS, DEFAULT_PAGE_SIZE, FUZZY_SEARCH_LIMIT, SEARCH_FIELDS, Library, parse_year
+
+MAX_BODY_SIZE = 1 << 20  # Максимальный размер тела запроса в байтах.
+MAX_GROUP_SIZE = 1000  # Максимальное количество изменений, сохраняемых одной записью.
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}  # Описания кодов ответа.
+
+
+class HTTPError(Exception):
+    """
+        Исключение HTTPError прерывает обработку запроса и возвращает клиенту код ответа status.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LibraryServer:
+    """
+        Класс LibraryServer обслуживает HTTP/JSON запросы к одной библиотеке.
+        Изменения ставятся в очередь и применяются группами, как в library.batch(): все изменения,
+        поступившие во время предыдущего сохранения, сохраняются вместе, а клиент получает ответ
+        только после того, как изменение записано на диск. Запись выполняется в отдельном потоке,
+        поэтому чтения обслуживаются и во время сохранения и могут вернуть ещё сохраняемые изменения.
+
+        GET    /books?page=1&page_size=20          - страница списка книг
+        GET    /books/<id>                         - книга с версией
+        GET    /search?field=title|author|year&q=  - поиск (для года: "1990" или "1990-2000");
+                                                     с fuzzy=1 - поиск с опечатками по названию и автору
+        POST   /books                              - добавление книги {"title", "author", "year"}
+        PUT    /books/<id>/status                  - изменение статуса {"status", "version"}
+        DELETE /books/<id>?version=<версия>        - удаление книги
+    """
+    def __init__(self, library, max_group=MAX_GROUP_SIZE):
+        self.library = library  # Библиотека, с которой работает сервис.
+        self.max_group = max_group  # Максимальное количество изменений в одной группе.
+        self.commits = 0  # Количество выполненных групповых сохранений.
+        self._queue = None  # Очередь изменений: (функция, аргументы, future для ответа).
+        self._committer = None  # Задача, применяющая изменения из очереди.
+        self._server = None
+
+    # Метод для запуска сервиса. Возвращает объект asyncio.Server.
+    async def start(self, host='127.0.0.1', port=8080):
+        self._queue = asyncio.Queue()
+        self._committer = asyncio.create_task(self._commit_loop())
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    # Метод для остановки сервиса после применения изменений, уже стоящих в очереди.
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        await self._queue.join()
+        self._committer.cancel()
+
+    # Задача, применяющая изменения группами. Пока выполняется сохранение одной группы,
+    # новые изменения накапливаются в очереди и попадают в следующую группу.
+    async def _commit_loop(self):
+        while True:
+            group = [await self._queue.get()]
+            await asyncio.sleep(0)  # Даём обработчикам, готовым к выполнению, поставить свои изменения в очередь.
+            while not self._queue.empty() and len(group) < self.max_group:
+                group.append(self._queue.get_nowait())
+            results = []
+            try:
+                # Изменения группы применяются в памяти, как в library.batch(), а запись на диск
+                # (fsync, сжатие журнала, фиксация транзакции) выполняется в отдельном потоке,
+                # чтобы во время сохранения сервис продолжал принимать запросы и отвечать на чтения.
+                with self.library._transaction():
+                    try:
+                        with self.library._collect_records() as records:
+                            for operation, args, future in group:
+                                try:
+                                    results.append((future, operation(*args), None))
+                                except (HTTPError, ValueError) as error:
+                                    # Ошибка одного изменения не отменяет остальные изменения группы.
+                                    results.append((future, None, error))
+                    finally:
+                        if records:
+                            await asyncio.to_thread(self.library._write_records, records)
+            except Exception as error:
+                # Если группу не удалось сохранить, об ошибке узнают все клиенты группы.
+                results = [(future, None, error) for operation, args, future in group]
+            self.commits += 1
+            for future, result, error in results:
+                if not future.done():
+                    if error is None:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(error)
+            for _ in group:
+                self._queue.task_done()
+
+    # Метод для постановки изменения в очередь и ожидания его сохранения.
+    async def _submit(self, operation, *args):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, args, future))
+        return await future
+
+    # Метод для преобразования книги в словарь ответа с версией книги.
+    def _book_payload(self, book):
+        payload = book.to_dict()
+        payload['version'] = self.library.get_version(book.book_id)
+        return payload
+
+    # Метод для проверки, что книга существует и не изменилась после чтения её версии клиентом.
+    def _check_version(self, book_id, expected_version):
+        version = self.library.get_version(book_id)
+        if version is None:
+            raise HTTPError(404, f"Книга с ID {book_id} не найдена")
+        if expected_version is not None and version != expected_version:
+            raise HTTPError(409, f"Книга с ID {book_id} изменена: версия {version}, ожидалась {expected_version}")
+
+    # Изменения, выполняемые внутри группы. Проверки выполняются по состоянию на момент применения изменения.
+    def _add(self, data):
+        book = {field: data[field] for field in ('book_id', 'title', 'author', 'year', 'status') if field in data}
+        book.setdefault('book_id', str(uuid.uuid4()))
+        if self.library.get_book(book['book_id']) is not None:
+            raise HTTPError(409, f"Книга с ID {book['book_id']} уже есть в библиотеке")
+        self.library.add_books([book])
+        return self._book_payload(self.library.get_book(book['book_id']))
+
+    def _remove(self, book_id, expected_version):
+        self._check_version(book_id, expected_version)
+        self.library.remove_books([book_id])
+        return {'book_id': book_id}
+
+    def _update_status(self, book_id, status, expected_version):
+        self._check_version(book_id, expected_version)
+        self.library.update_statuses({book_id: status})
+        return self._book_payload(self.library.get_book(book_id))
+
+    # Метод для разбора JSON тела запроса.
+    @staticmethod
+    def _json(body):
+        try:
+            data = json.loads(body or b'{}')
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise HTTPError(400, "Тело запроса должно быть JSON объектом") from None
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Тело запроса должно быть JSON объектом")
+        return data
+
+    # Метод для чтения целого параметра запроса.
+    @staticmethod
+    def _int_param(query, name, default=None):
+        if name not in query:
+            return default
+        try:
+            return int(query[name])
+        except ValueError:
+            raise HTTPError(400, f"Параметр {name} должен быть целым числом") from None
+
+    # Метод для поиска книг по названию, автору или году издания.
+    def _search(self, query):
+        field = query.get('field', 'title')
+        term = query.get('q', '')
+        limit = self._int_param(query, 'limit')
+        if field == 'year':
+            start, _, end = term.partition('-')
+            start, end = parse_year(start), parse_year(end or start)
+            if start is None or end is None:
+                raise HTTPError(400, "Год должен быть числом или диапазоном вида 1990-2000")
+            books = self.library.books_by_year(start, end)[:limit]
+        elif field in SEARCH_FIELDS and query.get('fuzzy') == '1':
+            books = self.library.fuzzy_search(field, term, limit=FUZZY_SEARCH_LIMIT if limit is None else limit)
+        elif field in SEARCH_FIELDS:
+            books = self.library.search(field, term, limit=limit)
+        else:
+            raise HTTPError(400, f"Поиск по полю '{field}' не поддерживается")
+        return {'books': [book.to_dict() for book in books]}
+
+    # Метод для получения страницы списка книг.
+    def _list(self, query):
+        page = self._int_param(query, 'page', 1)
+        page_size = self._int_param(query, 'page_size', DEFAULT_PAGE_SIZE)
+        if page < 1 or page_size < 1:
+            raise HTTPError(400, "Номер и размер страницы должны быть положительными")
+        books = self.library.iter_books((page - 1) * page_size, page * page_size)
+        return {'page': page, 'page_size': page_size, 'books': [book.to_dict() for book in books]}
+
+    # Метод для обработки одного запроса. Возвращает код ответа и словарь с телом ответа.
+    async def handle(self, method, target, body=b''):
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.split('/') if part]
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            if parts == ['books']:
+                if method == 'GET':
+                    return 200, self._list(query)
+                if method == 'POST':
+                    return 201, await self._submit(self._add, self._json(body))
+            elif len(parts) == 2 and parts[0] == 'books':
+                if method == 'GET':
+                    book = self.library.get_book(parts[1])
+                    if book is None:
+                        raise HTTPError(404, f"Книга с ID {parts[1]} не найдена")
+                    return 200, self._book_payload(book)
+                if method == 'DELETE':
+                    return 200, await self._submit(self._remove, parts[1], self._int_param(query, 'version'))
+            elif len(parts) == 3 and parts[0] == 'books' and parts[2] == 'status':
+                if method in ('PUT', 'PATCH'):
+                    data = self._json(body)
+                    if not isinstance(data.get('status'), str) or not data['status']:
+                        raise HTTPError(400, "Статус книги должен быть непустой строкой")
+                    version = data.get('version')
+                    if version is not None and (not isinstance(version, int) or isinstance(version, bool)):
+                        raise HTTPError(400, "Параметр version должен быть целым числом")
+                    return 200, await self._submit(self._update_status, parts[1], data['status'], version)
+            elif parts == ['search']:
+                if method == 'GET':
+                    return 200, self._search(query)
+            else:
+                raise HTTPError(404, "Неизвестный адрес")
+            raise HTTPError(405, f"Метод {method} не поддерживается для этого адреса")
+        except HTTPError as error:
+            return error.status, {'error': str(error)}
+        except ValueError as error:
+            return 400, {'error': str(error)}
+        except OSError as error:
+            # Изменение не удалось сохранить на диск.
+            return 500, {'error': str(error)}
+
+    # Метод для обработки соединения. Соединение HTTP/1.1 используется для нескольких запросов подряд.
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    await self._respond(writer, 400, {'error': "Некорректный запрос"}, keep_alive=False)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, {'error': "Слишком большое тело запроса"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self.handle(method, target, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # Клиент закрыл соединение посреди запроса.
+            pass
+        finally:
+            writer.close()
+
+    # Метод для отправки ответа в формате JSON.
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+        await writer.drain()
+
+
+# Функция клиента для отправки одного запроса по открытому соединению. Возвращает код ответа и тело.
+# Используется нагрузочным тестом и тестами сервиса.
+async def request(reader, writer, method, target, data=None):
+    body = b'' if data is None else json.dumps(data, ensure_ascii=False).encode('utf-8')
+    target = quote(target, safe="/?=&%")  # Символы не из ASCII (например, кириллица в запросе) кодируются.
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+# Функция для работы сервиса до прерывания (Ctrl+C).
+async def serve(library, host, port):
+    server = LibraryServer(library)
+    await server.start(host, port)
+    print(f"Сервис библиотеки запущен на http://{host}:{port}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='HTTP/JSON сервис библиотеки.')
+    parser.add_argument('--host', default='127.0.0.1', help='адрес для входящих соединений')
+    parser.add_argument('--port', type=int, default=8080, help='порт для входящих соединений')
+    parser.add_argument('--backend', choices=BACKENDS, default='json', help='бэкенд хранения книг')
+    parser.add_argument('--path', help='путь к файлу библиотеки (по умолчанию library.json или library.db)')
+    args = parser.parse_args(argv)
+
+    if args.backend == 'json':
+        # Изменения пишутся в журнал, как в консольном приложении.
+        library = Library(args.path or 'library.json', journal=True)
+    else:
+        library = Library(args.path or 'library.db', backend=args.backend)
+    try:
+        asyncio.run(serve(library, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        library.save_books()
+        library.close()
+
+
+if __name__ == '__main__':
+    main()
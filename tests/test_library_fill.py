@@ -0,0 +1,45 @@
+import json
+
+from library_fill import fill
+from library_manage import Library
+
+
+def test_fill_is_deterministic_for_any_number_of_workers(tmp_path, monkeypatch):
+    # Тестирование того, что при одинаковом зерне результат не зависит от количества процессов.
+    monkeypatch.setattr('library_fill.CHUNK_SIZE', 7)  # Маленькие части, чтобы задействовать несколько задач.
+    fill(30, str(tmp_path / "one.json"), workers=1, seed=5)
+    fill(30, str(tmp_path / "two.json"), workers=2, seed=5)
+    with open(tmp_path / "one.json", 'r', encoding='utf-8') as one, open(tmp_path / "two.json", 'r', encoding='utf-8') as two:
+        books = json.load(one)
+        assert books == json.load(two)
+    assert len(books) == 30
+    assert len({book['book_id'] for book in books}) == 30  # Проверка, что ID книг уникальны.
+
+
+def test_fill_formats(tmp_path):
+    # Тестирование записи каталога в форматах jsonl и sqlite.
+    fill(12, str(tmp_path / "library.jsonl"), 'jsonl', seed=1)
+    with open(tmp_path / "library.jsonl", 'r', encoding='utf-8') as file:
+        books = [json.loads(line) for line in file]
+    assert len(books) == 12 and books[0]['status'] == "В наличии"
+
+    fill(12, str(tmp_path / "library.db"), 'sqlite', seed=1)
+    library = Library(str(tmp_path / "library.db"), backend='sqlite')
+    assert [book.to_dict() for book in library.iter_books()] == books
+    library.close()
+
+
+def test_fill_sqlite_does_not_buffer_changes(tmp_path, monkeypatch):
+    # Тестирование того, что при заполнении базы SQLite изменения не накапливаются в памяти до конца пакета.
+    monkeypatch.setattr('library_fill.CHUNK_SIZE', 10)
+    buffered = []
+    add_books = Library.add_books
+
+    def add_books_and_measure(library, books):
+        count = add_books(library, books)
+        buffered.append(len(library._batch_records))
+        return count
+
+    monkeypatch.setattr(Library, 'add_books', add_books_and_measure)
+    fill(50, str(tmp_path / "library.db"), 'sqlite', seed=1)
+    assert buffered == [1] * 5
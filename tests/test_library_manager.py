@@ -1,10 +1,13 @@
 import json
 from io import StringIO
+import multiprocessing
 import os
 
 import pytest
 
-from library_manage import Library, Book
+from library_manage import (Library, Book, BookTable, SnapshotBooks, StaleVersionError, TrigramIndex,
+                            bounded_levenshtein, convert_snapshot, iter_json_books, iter_pages, show_pages,
+                            write_binary_snapshot)
 
 sample_books = [
     {
@@ -31,13 +34,40 @@ sample_books = [
 ]
 
 
+# Пустая библиотека для каждого бэкенда и способа хранения книг.
+@pytest.fixture(params=['json', 'columnar', 'sqlite'])
+def empty_library(request, tmp_path):
+    if request.param == 'sqlite':
+        library = Library(backend='sqlite', path=str(tmp_path / "test_books.db"))
+    elif request.param == 'columnar':
+        library = Library("test_books.json", columnar=True)
+    else:
+        library = Library("test_books.json")
+    yield library
+    library.close()
+
+
 @pytest.fixture
-def sample_library():
-    library = Library("test_books.json")
+def sample_library(empty_library):
+    library = empty_library
     library.books = [Book(**book) for book in json.load(StringIO(json.dumps(sample_books, ensure_ascii=False)))]
     return library
 
 
+# Библиотека с тестовыми книгами в JSON файле, для тестов сохранения в файл.
+@pytest.fixture
+def json_library(tmp_path):
+    library = Library(str(tmp_path / "test_books.json"))
+    library.books = [Book(**book) for book in sample_books]
+    return library
+
+
+# Функция для получения списка операций из журнала библиотеки.
+def journal_ops(library):
+    with open(library.journal_filename, 'r', encoding='utf-8') as file:
+        return [json.loads(line)['op'] for line in file]
+
+
 # Тест успешной загрузки книг
 def test_load_books_success(monkeypatch):
     library = Library()  # Создаем экземпляр библиотеки
@@ -70,16 +100,13 @@ def test_load_books_file_not_found(monkeypatch):
 
 
 # Тест успешного сохранения книг
-def test_save_books_success(monkeypatch, sample_library):
-    # Определяем функцию mock_open, которая будет возвращать StringIO объект
-    def mock_open():
-        return StringIO(json.dumps(sample_books, ensure_ascii=False))
-
-    monkeypatch.setattr('builtins.open', lambda *args, **kwargs: mock_open())  # Используем monkeypatch для замены функции open на mock_open
-    sample_library.save_books()  # Вызываем функцию save_books
+def test_save_books_success(json_library):
+    # Файл записывается во временный файл и атомарно подменяется, поэтому сохранение проверяется на реальном файле.
+    json_library.save_books()  # Вызываем функцию save_books
 
     # Проверяем, что данные книг были записаны в файл в формате JSON
-    with open("test_books.json", 'r', encoding='utf-8') as file:
+    assert not os.path.exists(json_library.filename + ".tmp")
+    with open(json_library.filename, 'r', encoding='utf-8') as file:
         books = json.load(file)
         assert len(books) == 3
         assert books[0]['title'] == "Органичная и направленная координация"
@@ -88,7 +115,7 @@ def test_save_books_success(monkeypatch, sample_library):
 
 
 # Тест обработки ошибки при записи в файл
-def test_save_books_io_error(monkeypatch, sample_library):
+def test_save_books_io_error(monkeypatch, json_library):
     # Определяем функцию mock_open, которая будет вызывать IOError
     def mock_open():
         raise IOError("Unable to write to file")
@@ -97,12 +124,12 @@ def test_save_books_io_error(monkeypatch, sample_library):
 
     # Проверяем, что при вызове save_books возникает IOError
     with pytest.raises(IOError, match="Unable to write to file"):
-        sample_library.save_books()
+        json_library.save_books()
 
 
 # Тест успешного добавления книги
-def test_add_book(monkeypatch):
-    library = Library("test_books.json")  # Создаем экземпляр библиотеки
+def test_add_book(monkeypatch, empty_library):
+    library = empty_library  # Экземпляр библиотеки
 
     # Определяем функцию mock_save_books, которая ничего не делает
     def mock_save_books():
@@ -121,8 +148,8 @@ def test_add_book(monkeypatch):
 
 
 # Тест добавления книги с проверкой сохранения
-def test_add_book_with_save(monkeypatch):
-    library = Library("test_books.json")  # Создаем экземпляр библиотеки
+def test_add_book_with_save(monkeypatch, empty_library):
+    library = empty_library  # Экземпляр библиотеки
 
     # Определяем функцию mock_save_books, которая проверяет вызов сохранения
     def mock_save_books():
@@ -258,4 +285,700 @@ def test_update_status_book_not_found(capsys, sample_library):
 
     assert "Книга с ID 777 не найдена" in captured.out  # Проверка, что выводится сообщение об ошибке.
 
-    os.remove("test_books.json")  # Удаление тестового JSON файла библиотеки
+    for filename in ("test_books.json", "test_books.json.lock"):
+        if os.path.exists(filename):
+            os.remove(filename)  # Удаление тестового JSON файла библиотеки и файла блокировки
+
+
+def test_journal_appends_without_rewriting_snapshot(tmp_path):
+    # Тестирование режима журнала: изменения дописываются в журнал, снимок не перезаписывается.
+    filename = str(tmp_path / "library.json")
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(sample_books, file, ensure_ascii=False)
+    library = Library(filename, journal=True)
+    library.add_book("4", "Book 4", "Author 4", "2024")
+    library.remove_book("83d80f3f-874e-4150-91ed-aa7986b5f7cd")
+    library.update_status("1eea1a99-410a-4524-b374-b2c9f1b04a16", "Выдана")
+
+    with open(filename, 'r', encoding='utf-8') as file:
+        assert json.load(file) == sample_books  # Проверка, что снимок не изменился.
+    assert journal_ops(library) == ['add', 'remove', 'status']
+
+    # Проверка, что новая библиотека восстанавливает состояние из снимка и журнала.
+    reloaded = Library(filename, journal=True)
+    assert [book.book_id for book in reloaded.books] == [
+        "1eea1a99-410a-4524-b374-b2c9f1b04a16", "9acfe847-1910-4d20-b0f4-b8fbb384b942", "4"]
+    assert reloaded.books[0].status == "Выдана"
+
+
+def test_journal_compact_and_torn_record(tmp_path):
+    # Тестирование сжатия журнала и пропуска недописанной записи.
+    filename = str(tmp_path / "library.json")
+    library = Library(filename, journal=True)
+    library.add_book("1", "Book 1", "Author 1", "2001")
+    with open(library.journal_filename, 'a', encoding='utf-8') as file:
+        file.write('{"op": "remove", "book_')  # Имитация сбоя во время записи.
+    reloaded = Library(filename, journal=True)
+    assert [book.book_id for book in reloaded.books] == ["1"]
+    reloaded.add_book("2", "Book 2", "Author 2", "2002")  # Запись после повреждённой строки не должна потеряться.
+    assert [book.book_id for book in Library(filename, journal=True).books] == ["1", "2"]
+
+    library.save_books()  # Сжатие журнала в снимок.
+    assert journal_ops(library) == ['checkpoint']  # В журнале остаётся только номер последнего изменения.
+    with open(filename, 'r', encoding='utf-8') as file:
+        assert json.load(file)[0]['title'] == "Book 1"
+
+
+def test_journal_record_without_newline(tmp_path):
+    # Тестирование записи с полным JSON, но без перевода строки: она считается недописанной и отбрасывается.
+    filename = str(tmp_path / "library.json")
+    library = Library(filename, journal=True)
+    library.add_book("1", "Book 1", "Author 1", "2001")
+    with open(library.journal_filename, 'a', encoding='utf-8') as file:
+        file.write(json.dumps({'op': 'add', 'seq': 2, 'book': Book("2", "Book 2", "Author 2", "2002").to_dict()}))
+    reloaded = Library(filename, journal=True)
+    assert [book.book_id for book in reloaded.books] == ["1"]
+    reloaded.add_book("3", "Book 3", "Author 3", "2003")  # Подтверждённая запись не должна потеряться.
+    assert [book.book_id for book in Library(filename, journal=True).books] == ["1", "3"]
+
+
+def test_journal_auto_compact(tmp_path):
+    # Тестирование автоматического сжатия журнала при достижении порога.
+    filename = str(tmp_path / "library.json")
+    library = Library(filename, journal=True, journal_limit=3)
+    for i in range(3):
+        library.add_book(str(i), f"Book {i}", "Author", "2000")
+    assert journal_ops(library) == ['checkpoint']
+    assert len(Library(filename, journal=True).books) == 3
+
+
+def test_get_book_index_stays_in_sync(monkeypatch, sample_library):
+    # Тестирование индекса по ID: поиск, добавление и удаление книг.
+    monkeypatch.setattr(sample_library, "save_books", lambda: None)  # Отключаем сохранение в файл
+    assert sample_library.get_book("1eea1a99-410a-4524-b374-b2c9f1b04a16").author == "Моисеев Селиверст Артурович"
+    assert sample_library.get_book("777") is None
+
+    sample_library.add_book("5", "Book 5", "Author 5", "2005")
+    sample_library.remove_book("1eea1a99-410a-4524-b374-b2c9f1b04a16")
+    assert sample_library.get_book("5").title == "Book 5"
+    assert sample_library.get_book("1eea1a99-410a-4524-b374-b2c9f1b04a16") is None
+    # Проверка, что порядок оставшихся книг сохранился.
+    assert [book.book_id for book in sample_library.books] == [
+        "83d80f3f-874e-4150-91ed-aa7986b5f7cd", "9acfe847-1910-4d20-b0f4-b8fbb384b942", "5"]
+
+
+def test_search_prefix_and_multiword(sample_library):
+    # Тестирование поиска по инвертированному индексу: префиксы, несколько слов и регистр.
+    assert [book.book_id for book in sample_library.search('title', 'НАПРАВ')] == [
+        "83d80f3f-874e-4150-91ed-aa7986b5f7cd", "9acfe847-1910-4d20-b0f4-b8fbb384b942"]
+    results = sample_library.search('title', 'напр обор')  # Оба слова должны встретиться в названии.
+    assert [book.title for book in results] == ["Амортизированное и направленное оборудование"]
+    # Результаты идут в порядке каталога, поэтому лимит оставляет первые по порядку книги.
+    assert [book.book_id for book in sample_library.search('author', 'а', limit=2)] == [
+        "83d80f3f-874e-4150-91ed-aa7986b5f7cd", "1eea1a99-410a-4524-b374-b2c9f1b04a16"]
+    assert sample_library.search('author', 'Моисеев Иван') == []
+    with pytest.raises(ValueError):
+        sample_library.search('year', '1990')
+
+
+def test_search_index_incremental_and_yo_folding(monkeypatch, sample_library):
+    # Тестирование обновления индекса при добавлении и удалении книг и замены "ё" на "е".
+    monkeypatch.setattr(sample_library, "save_books", lambda: None)  # Отключаем сохранение в файл
+    assert sample_library.search('author', 'Артём') == []  # Индекс строится при первом поиске.
+    sample_library.add_book("5", "Ёжик в тумане", "Артём Сергеевич Козлов", "1975")
+    assert [book.book_id for book in sample_library.search('author', 'артем')] == ["5"]
+    assert [book.book_id for book in sample_library.search('title', 'ежик туман')] == ["5"]
+    sample_library.remove_book("5")
+    assert sample_library.search('title', 'ежик') == []
+
+
+def test_search_order_matches_sqlite(tmp_path):
+    # Тестирование порядка результатов: он не зависит от хэширования строк и совпадает с бэкендом SQLite.
+    books = [Book(str(number), title, author, "2000") for number, (title, author) in enumerate([
+        ("Направленная ось", "Иван Петров"), ("Наука и жизнь", "Пётр Иванов"), ("Оборудование", "Иван Иванов"),
+        ("Направленная наука", "Наум Петров"), ("Ось и наука", "Иван Наумов"),
+    ])]
+    json_library = Library(str(tmp_path / "library.json"), journal=True)
+    lazy_library = Library(str(tmp_path / "lazy.json"), lazy=True)
+    sqlite_library = Library(str(tmp_path / "library.db"), backend="sqlite")
+    for library in (json_library, lazy_library, sqlite_library):
+        library.books = books
+        library.add_book("1", "Наука", "Иван Петров", "2000")  # Заменённая книга считается добавленной заново.
+        assert [book.book_id for book in library.iter_books()] == ["0", "2", "3", "4", "1"]
+    for field, query, limit in [('title', 'на', None), ('title', 'на', 2), ('title', 'наука', None),
+                                ('author', 'иван', 3), ('author', 'ив пет', None), ('author', 'на ив', 1)]:
+        expected = [book.book_id for book in sqlite_library.search(field, query, limit)]
+        assert [book.book_id for book in json_library.search(field, query, limit)] == expected
+        assert [book.book_id for book in lazy_library.search(field, query, limit)] == expected
+    assert [book.book_id for book in json_library.search('title', 'на')] == ["0", "3", "4", "1"]
+    for library in (json_library, lazy_library, sqlite_library):
+        library.close()
+
+
+@pytest.mark.parametrize("kind", ["journal", "columnar", "lazy"])
+def test_search_index_replaced_book(tmp_path, kind):
+    # Тестирование замены книги с тем же ID: старые слова удаляются из индекса токенов и триграмм
+    # и из кэша поиска, в том числе если в ленивом режиме книга хранится только в файле.
+    filename = str(tmp_path / "library.json")
+    if kind == "lazy":
+        Library(filename, lazy=True).books = [Book("1", "Alpha story", "Author", "2000")]
+        library = Library(filename, lazy=True)
+    else:
+        library = Library(filename, journal=True, columnar=kind == "columnar")
+        library.add_book("1", "Alpha story", "Author", "2000")
+    assert [book.title for book in library.search('title', 'alpha')] == ["Alpha story"]
+    assert [book.title for book in library.fuzzy_search('title', 'alpja')] == ["Alpha story"]
+    library.add_book("1", "Beta story", "Author", "2000")
+    assert library.search('title', 'alpha') == [] and library.fuzzy_search('title', 'alpja') == []
+    assert [book.title for book in library.search('title', 'beta')] == ["Beta story"]
+    library.remove_book("1")
+    assert library.search('title', 'alpha') == [] and library.search('title', 'story') == []
+    library.close()
+    assert Library(filename, journal=True).search('title', 'alpha') == []
+
+
+def test_books_by_year_range(monkeypatch, sample_library):
+    # Тестирование диапазонных запросов по индексу года издания.
+    monkeypatch.setattr(sample_library, "save_books", lambda: None)  # Отключаем сохранение в файл
+    assert [book.year for book in sample_library.books_by_year(1970, 1980)] == ["1973", "1979"]
+    assert [book.year for book in sample_library.books_by_year(1990)] == ["1990"]
+    assert sample_library.books_by_year(2000, 2100) == []
+    # Годы, переданные строками, преобразуются в числа, некорректные отклоняются.
+    assert [book.year for book in sample_library.books_by_year("1970", "1980")] == ["1973", "1979"]
+    assert [book.year for book in sample_library.books_by_year("1990")] == ["1990"]
+    with pytest.raises(ValueError):
+        sample_library.books_by_year("девяностые")
+
+    sample_library.add_book("5", "Book 5", "Author 5", 1975)
+    sample_library.add_book("6", "Book 6", "Author 6", "неизвестен")  # Некорректный год не попадает в индекс.
+    assert [book.book_id for book in sample_library.books_by_year(1974, 1976)] == ["5"]
+    sample_library.remove_book("5")
+    assert sample_library.books_by_year(1974, 1976) == []
+
+
+def test_find_book_by_year_exact_match(monkeypatch, sample_library):
+    # Тестирование того, что поиск по году не совпадает по подстроке.
+    inputs = iter(['3', '19'])  # Список ввода пользователя
+    monkeypatch.setattr('builtins.input', lambda _: next(inputs))
+    assert sample_library.find_book() == []
+
+
+def test_sqlite_backend_persists_between_sessions(tmp_path):
+    # Тестирование SQLite бэкенда: данные сохраняются между сеансами, база работает в режиме WAL.
+    path = str(tmp_path / "library.db")
+    library = Library(backend='sqlite', path=path)
+    assert library.backend == 'sqlite'
+    library.add_book("1", "Ёжик в тумане", "Сергей Козлов", "1969")
+    library.add_book("2", "Book 2", "Author 2", "2002")
+    library.update_status("1", "Выдана")
+    library.remove_book("2")
+    library.close()
+
+    reopened = Library(backend='sqlite', path=path)
+    assert len(reopened) == 1
+    assert reopened.get_book("1").status == "Выдана"
+    assert [book.book_id for book in reopened.search('title', 'ежик')] == ["1"]
+    assert [book.book_id for book in reopened.books_by_year(1960, 1970)] == ["1"]
+    assert reopened._connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    reopened.close()
+
+    with pytest.raises(ValueError):
+        Library(backend='csv')
+
+
+def test_sqlite_search_tokenizes_like_python(tmp_path):
+    # Тестирование того, что полнотекстовый индекс SQLite разбивает текст на слова так же, как tokenize():
+    # буквы с диакритикой не заменяются, подчёркивание входит в слово.
+    books = [Book("1", "Élise et Elise", "Émile", "2000"), Book("2", "foo_bar", "Elise", "2001"),
+             Book("3", "foo bar", "Émile_Zola", "2002")]
+    json_library = Library(str(tmp_path / "library.json"))
+    sqlite_library = Library(backend='sqlite', path=str(tmp_path / "library.db"))
+    for library in (json_library, sqlite_library):
+        library.books = books
+    for field, query in [('title', 'élise'), ('title', 'elise'), ('title', 'foo_bar'), ('title', 'bar'),
+                         ('title', 'foo'), ('author', 'émile'), ('author', 'zola'), ('author', 'emile')]:
+        expected = [book.book_id for book in json_library.search(field, query)]
+        assert [book.book_id for book in sqlite_library.search(field, query)] == expected
+    assert [book.book_id for book in sqlite_library.search('title', 'bar')] == ["3"]
+    assert [book.book_id for book in sqlite_library.fuzzy_search('title', 'foo_baz')] == ["2"]
+
+    # База с индексом, созданным стандартным токенизатором, индексируется заново при открытии.
+    sqlite_library._connection.executescript("""
+        DROP TABLE books_vocab;
+        DROP TABLE books_fts;
+        CREATE VIRTUAL TABLE books_fts USING fts5 (title, author);
+        INSERT INTO books_fts (rowid, title, author) SELECT rowid, lower(title), lower(author) FROM books;
+    """)
+    sqlite_library.close()
+    reopened = Library(backend='sqlite', path=str(tmp_path / "library.db"))
+    assert [book.book_id for book in reopened.search('title', 'foo_bar')] == ["2"]
+    assert [book.book_id for book in reopened.search('author', 'émile')] == ["1", "3"]
+    reopened.close()
+
+
+def test_iter_json_books_streams_elements():
+    # Тестирование потокового разбора JSON массива маленькими фрагментами.
+    text = json.dumps(sample_books, ensure_ascii=False, indent=4)
+    books = list(iter_json_books(StringIO(text), chunk_size=7))
+    assert [book.book_id for book in books] == [book['book_id'] for book in sample_books]
+    assert books[1].author == "Моисеев Селиверст Артурович"
+    assert list(iter_json_books(StringIO(' [ ] '))) == []
+    assert list(iter_json_books(StringIO(''))) == []
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_books(StringIO('[{"book_id": "1", "title"'), chunk_size=4))
+    # Массивы, которые отклоняет json.load, отклоняются и при потоковом разборе.
+    book = json.dumps(sample_books[0], ensure_ascii=False)
+    for text in (f'[{book} {book}]', f'[,{book}]', f'[{book},]', f'[{book},,{book}]', '[,]',
+                 f'[{book}] [{book}]', f'[{book}]]', f'[{book}] x'):
+        with pytest.raises(json.JSONDecodeError):
+            json.loads(text)
+        for chunk_size in (3, 1 << 16):
+            with pytest.raises(json.JSONDecodeError):
+                list(iter_json_books(StringIO(text), chunk_size=chunk_size))
+    assert len(list(iter_json_books(StringIO(f' [ {book} , {book} ] \n'), chunk_size=5))) == 2
+
+
+def test_lazy_library_reads_file_without_loading(tmp_path):
+    # Тестирование ленивого режима: поиск и изменения без загрузки каталога в память.
+    filename = str(tmp_path / "library.json")
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(sample_books, file, ensure_ascii=False, indent=4)
+    library = Library(filename, lazy=True)
+    assert not hasattr(library, '_books')  # Каталог не загружен в память.
+    assert [book.title for book in library.search('title', 'направ обор')] == [
+        "Амортизированное и направленное оборудование"]
+    assert [book.year for book in library.books_by_year(1970, 1980)] == ["1973", "1979"]
+    assert [book.year for book in library.books_by_year("1970", "1980")] == ["1973", "1979"]
+    with pytest.raises(ValueError):
+        library.books_by_year(1970, "")
+
+    library.add_book("4", "Book 4", "Author 4", "2024")
+    library.remove_book("83d80f3f-874e-4150-91ed-aa7986b5f7cd")
+    library.update_status("1eea1a99-410a-4524-b374-b2c9f1b04a16", "Выдана")
+    with open(filename, 'r', encoding='utf-8') as file:
+        assert json.load(file) == sample_books  # Файл библиотеки не перезаписывается при изменениях.
+
+    # Проверка, что изменения из журнала видны в новом сеансе и после сжатия.
+    # Параметр journal=True допускается: в ленивом режиме журнал ведётся всегда.
+    reloaded = Library(filename, True, lazy=True, columnar=False)
+    assert reloaded.journal and reloaded.journal_limit == 1000
+    assert [book.book_id for book in reloaded.iter_books()] == [
+        "1eea1a99-410a-4524-b374-b2c9f1b04a16", "9acfe847-1910-4d20-b0f4-b8fbb384b942", "4"]
+    assert reloaded.get_book("1eea1a99-410a-4524-b374-b2c9f1b04a16").status == "Выдана"
+    reloaded.save_books()
+    assert [book.status for book in Library(filename).books] == ["Выдана", "В наличии", "В наличии"]
+    with pytest.raises(ValueError):
+        Library(filename, lazy=True, journal=False)
+    with pytest.raises(ValueError):
+        Library(filename, lazy=True, columnar=True)
+
+
+def test_book_table_round_trip():
+    # Тестирование хранения книг по столбцам: доступ к атрибутам, изменение и запись в JSON без потерь.
+    books = [Book(**book) for book in sample_books] + [Book(4, "Book 4", "Author 4", 2024, "Списана"),
+                                                        Book("5", "Book 5", "Author 5", "0999")]
+    table = BookTable(books)
+    assert [table[book.book_id].to_dict() for book in books] == [book.to_dict() for book in books]
+    assert table.years.typecode == 'H' and table.statuses.typecode == 'B'
+
+    table["1eea1a99-410a-4524-b374-b2c9f1b04a16"].status = "Выдана"
+    assert table["1eea1a99-410a-4524-b374-b2c9f1b04a16"].status == "Выдана"
+    removed = table.pop("83d80f3f-874e-4150-91ed-aa7986b5f7cd")
+    assert removed.title == "Органичная и направленная координация"
+    del table["9acfe847-1910-4d20-b0f4-b8fbb384b942"]
+    del table[4]  # После удаления большей части строк таблица уплотняется.
+    assert len(table.book_ids) == 2
+    assert [row.to_dict() for row in table.values()] == [
+        {**sample_books[1], "status": "Выдана"}, books[4].to_dict()]
+
+
+def test_book_has_no_instance_dict():
+    # Тестирование того, что у книги нет словаря атрибутов, а повторяющиеся строки интернированы.
+    book = Book("1", "Title", "Author", "2000")
+    assert not hasattr(book, '__dict__')
+    assert Book("2", "Title", "".join(["Au", "thor"]), "2000").author is book.author
+
+
+def test_bulk_operations_save_once(monkeypatch, sample_library):
+    # Тестирование пакетных операций: проверка данных до изменений и одно сохранение на операцию.
+    saves = []
+    monkeypatch.setattr(sample_library, "save_books", lambda: saves.append(True))
+
+    assert sample_library.add_books([Book("4", "Book 4", "Author 4", "2004"),
+                                     {"book_id": "5", "title": "Book 5", "author": "Author 5", "year": "2005"}]) == 2
+    assert sample_library.update_statuses({"4": "Выдана", "5": "В наличии"}) == 1
+    assert sample_library.remove_books(["83d80f3f-874e-4150-91ed-aa7986b5f7cd", "5"]) == 2
+    assert len(saves) == 3  # Проверка, что каждая пакетная операция сохраняет библиотеку один раз.
+    assert sample_library.get_book("4").status == "Выдана"
+    assert len(sample_library) == 3
+
+    # Проверка, что при ошибке в данных библиотека не изменяется.
+    with pytest.raises(ValueError):
+        sample_library.add_books([Book("6", "Book 6", "Author 6", "2006"), Book("4", "Book 4", "Author 4", "2004")])
+    with pytest.raises(ValueError):
+        sample_library.remove_books(["4", "777"])
+    with pytest.raises(ValueError):
+        sample_library.add_books([{"book_id": "7", "title": "Book 7"}])
+    assert len(sample_library) == 3 and sample_library.get_book("6") is None and len(saves) == 3
+
+
+def test_batch_defers_save(monkeypatch, sample_library):
+    # Тестирование контекстного менеджера batch(): сохранение выполняется один раз при выходе.
+    saves = []
+    monkeypatch.setattr(sample_library, "save_books", lambda: saves.append(True))
+    with sample_library.batch():
+        sample_library.add_book("4", "Book 4", "Author 4", "2004")
+        sample_library.update_status("4", "Выдана")
+        with sample_library.batch():  # Вложенный блок не сохраняет библиотеку отдельно.
+            sample_library.remove_book("83d80f3f-874e-4150-91ed-aa7986b5f7cd")
+        assert saves == []
+    assert saves == [True]
+
+
+def test_journal_batch_single_fsync(monkeypatch, tmp_path):
+    # Тестирование того, что в режиме журнала пакет изменений записывается одним сбросом на диск.
+    library = Library(str(tmp_path / "library.json"), journal=True)
+    fsyncs = []
+    monkeypatch.setattr(os, "fsync", lambda fd: fsyncs.append(fd))
+    library.add_books(Book(str(i), f"Book {i}", "Author", "2000") for i in range(10))
+    assert len(fsyncs) == 1
+    assert len(Library(str(tmp_path / "library.json"), journal=True)) == 10
+
+
+@pytest.mark.parametrize("extension", ["csv", "jsonl"])
+def test_import_export_round_trip(tmp_path, sample_library, extension):
+    # Тестирование потокового экспорта и импорта книг в CSV и JSONL.
+    filename = str(tmp_path / f"books.{extension}")
+    assert sample_library.export_books(filename) == 3
+    target = Library(str(tmp_path / "imported.json"))
+    assert target.import_books(filename, chunk_size=2) == 3
+    assert [book.to_dict() for book in target.books] == sample_books
+
+    # Проверка, что строки без ID и статуса получают новый ID и статус "В наличии".
+    with open(tmp_path / "feed.csv", 'w', encoding='utf-8') as file:
+        file.write("title,author,year\nНовая книга,Новый автор,2020\n")
+    target.import_books(str(tmp_path / "feed.csv"))
+    assert target.search('title', 'новая')[0].status == "В наличии"
+    with pytest.raises(ValueError):
+        target.export_books(str(tmp_path / "books.xml"))
+
+
+def test_display_books_pages(monkeypatch, sample_library):
+    # Тестирование постраничного отображения: в таблице только книги запрошенной страницы.
+    table = sample_library.display_books(page=2, page_size=2)
+    assert table.rows == [["9acfe847-1910-4d20-b0f4-b8fbb384b942", "Амортизированное и направленное оборудование",
+                           "Волкова Антонина Антоновна", "1990", "В наличии"]]
+    assert sample_library.display_books(page=3, page_size=2) is None
+    assert [len(page.rows) for page in sample_library.iter_pages(page_size=2)] == [2, 1]
+
+
+def test_show_pages_stops_on_quit(monkeypatch, capsys):
+    # Тестирование вывода страниц в консоль: после "q" следующие страницы не строятся.
+    books = [Book(str(i), f"Book {i}", "Author", "2000") for i in range(5)]
+    monkeypatch.setattr('builtins.input', lambda _: 'q')
+    show_pages(iter_pages(books, page_size=2))
+    captured = capsys.readouterr()
+    assert "Страница 1" in captured.out and "Book 1" in captured.out
+    assert "Страница 2" not in captured.out and "Book 2" not in captured.out
+
+
+# Функция для открытия второго сеанса работы с тем же файлом библиотеки.
+def open_session(kind, filename):
+    if kind == 'sqlite':
+        return Library(filename, backend='sqlite')
+    if kind == 'lazy':
+        return Library(filename, lazy=True)
+    return Library(filename, journal=True)
+
+
+@pytest.mark.parametrize("kind", ["journal", "lazy", "sqlite"])
+def test_stale_version_between_sessions(tmp_path, kind):
+    # Тестирование версий книг: изменение, сделанное в другом сеансе, обнаруживается при записи.
+    filename = str(tmp_path / ("library.db" if kind == 'sqlite' else "library.json"))
+    first = open_session(kind, filename)
+    first.add_books(Book(**book) for book in sample_books)
+    second = open_session(kind, filename)
+    book_id = "1eea1a99-410a-4524-b374-b2c9f1b04a16"
+    version = first.get_version(book_id)
+    assert second.get_version(book_id) == version and first.get_version("777") is None
+
+    second.update_status(book_id, "Выдана", expected_version=version)
+    with pytest.raises(StaleVersionError):
+        first.update_status(book_id, "Списана", expected_version=version)
+    with pytest.raises(StaleVersionError):
+        first.remove_book(book_id, expected_version=version)
+    # Перед проверкой первый сеанс прочитал изменение второго и может продолжить с новой версией.
+    assert first.get_book(book_id).status == "Выдана"
+    first.update_status(book_id, "Списана", expected_version=second.get_version(book_id))
+
+    # Версии продолжают расти после сжатия журнала.
+    first.save_books()
+    second.refresh()
+    assert second.get_book(book_id).status == "Списана"
+    assert second.get_version(book_id) == first.get_version(book_id) > version
+    first.close()
+    second.close()
+
+
+@pytest.mark.parametrize("kind", ["journal", "lazy", "sqlite"])
+def test_version_survives_compaction(tmp_path, kind):
+    # Тестирование того, что сжатие журнала и изменение на тот же статус не меняют версии книг.
+    filename = str(tmp_path / ("library.db" if kind == 'sqlite' else "library.json"))
+    first = open_session(kind, filename)
+    first.add_book("x", "Book X", "Author", "2000")
+    first.add_book("y", "Book Y", "Author", "2000")
+    second = open_session(kind, filename)
+    version = second.get_version("x")
+
+    first.update_status("y", "Выдана")
+    first.update_status("x", "В наличии")  # Статус не меняется.
+    first.save_books()  # Сжатие журнала между чтением версии и её использованием.
+    assert first.get_version("x") == version
+    assert open_session(kind, filename).get_version("x") == version
+    second.update_status("x", "Выдана", expected_version=version)
+    assert second.get_version("x") > version
+    first.refresh()
+    assert first.get_version("x") == second.get_version("x") and first.get_book("x").status == "Выдана"
+    first.close()
+    second.close()
+
+
+# Функция одного процесса нагрузочного теста: добавление книг и изменение статусов общих книг.
+def concurrent_worker(filename, worker, count):
+    library = Library(filename, journal=True, journal_limit=5)  # Небольшой порог, чтобы журнал часто сжимался.
+    for i in range(count):
+        library.add_book(f"{worker}-{i}", f"Book {worker}-{i}", f"Author {worker}", "2000")
+        library.update_status(sample_books[i % len(sample_books)]["book_id"], f"Статус {worker}-{i}")
+        if i % 7 == 0:
+            library.save_books()
+    library.close()
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="нужен запуск процессов через fork")
+def test_concurrent_processes_do_not_lose_updates(tmp_path):
+    # Тестирование одновременной работы нескольких процессов с одним файлом библиотеки.
+    filename = str(tmp_path / "library.json")
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(sample_books, file, ensure_ascii=False)
+    context = multiprocessing.get_context('fork')
+    workers, count = 4, 20
+    processes = [context.Process(target=concurrent_worker, args=(filename, worker, count)) for worker in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    library = Library(filename, journal=True)
+    # Ни одна добавленная книга не потеряна, а статусы общих книг взяты из записей процессов.
+    assert {f"{worker}-{i}" for worker in range(workers) for i in range(count)} <= {book.book_id for book in library.books}
+    assert len(library) == workers * count + len(sample_books)
+    assert all(library.get_book(book["book_id"]).status.startswith("Статус ") for book in sample_books)
+
+
+def test_search_cache_precise_invalidation(monkeypatch, sample_library):
+    # Тестирование кэша поиска: повторный запрос берётся из кэша, а изменение книги удаляет
+    # только те результаты, в которые эта книга попадает.
+    monkeypatch.setattr(sample_library, "save_books", lambda: None)  # Отключаем сохранение в файл
+    library = sample_library
+    assert [book.year for book in library.search('title', 'направленн')] == ["1979", "1990"]
+    library.search('author', 'Волкова')
+    assert [book.year for book in library.search('title', 'НАПРАВЛЕНН')] == ["1979", "1990"]
+    assert library.cache_info() == {'hits': 1, 'misses': 2, 'size': 2, 'maxsize': 1024}
+
+    # Книга с другим названием и автором не затрагивает кэш.
+    library.add_book("4", "Ядро системы", "Иванов", "2024")
+    assert library.cache_info()['size'] == 2
+    # Новая книга с подходящим названием удаляет только результат поиска по названию.
+    library.add_book("5", "Направленный поиск", "Петров", "2024")
+    assert library.cache_info()['size'] == 1
+    assert [book.book_id for book in library.search('title', 'направленн')][-1] == "5"
+    # Изменение статуса видно в результатах из кэша.
+    library.update_status("9acfe847-1910-4d20-b0f4-b8fbb384b942", "Выдана")
+    assert library.search('author', 'волкова')[0].status == "Выдана"
+    library.remove_book("5")
+    assert [book.year for book in library.search('title', 'направленн')] == ["1979", "1990"]
+
+
+def test_search_cache_is_bounded(sample_library):
+    # Тестирование вытеснения давно не использованных запросов и результатов, найденных с лимитом.
+    sample_library.cache_size = 2
+    sample_library.search('title', 'органичная')
+    sample_library.search('title', 'амортизированное')
+    sample_library.search('title', 'органичная')
+    sample_library.search('title', 'ядро')  # Вытесняет самый давний запрос "амортизированное".
+    assert sample_library.cache_info()['size'] == 2
+    sample_library.search('title', 'амортизированное')
+    sample_library.search('title', 'органичная')
+    assert sample_library.cache_info()['hits'] == 1
+    assert len(sample_library.search('title', 'и', limit=1)) == 1
+    assert len(sample_library.search('title', 'и')) == 3  # Результат с лимитом не подходит для полного запроса.
+
+
+def test_binary_snapshot_round_trip(tmp_path):
+    # Тестирование преобразования JSON -> двоичный снимок -> JSON без потерь, включая числовые ID и годы.
+    books = [Book(**book) for book in sample_books] + [Book(4, "Book 4", "Автор", 2024, "Выдана"),
+                                                        Book("5", "", "Автор", None)]
+    source = tmp_path / "library.json"
+    with open(source, 'w', encoding='utf-8') as file:
+        json.dump([book.to_dict() for book in books], file, ensure_ascii=False)
+    assert convert_snapshot(str(source), str(tmp_path / "library.lbs")) == 5
+    assert convert_snapshot(str(tmp_path / "library.lbs"), str(tmp_path / "copy.json")) == 5
+    with open(tmp_path / "copy.json", 'r', encoding='utf-8') as file:
+        assert json.load(file) == [book.to_dict() for book in books]
+
+    snapshot = SnapshotBooks(str(tmp_path / "library.lbs"))
+    assert list(snapshot) == [book.book_id for book in books]
+    assert snapshot[4].year == 2024 and "4" not in snapshot
+    # Строки, которые нельзя закодировать в UTF-8, тоже сохраняются без потерь.
+    with open(tmp_path / "surrogate.lbs", 'wb') as file:
+        write_binary_snapshot(file, [Book("\udc80", "Книга", "Автор", "2000")])
+    assert SnapshotBooks(str(tmp_path / "surrogate.lbs"))["\udc80"].title == "Книга"
+
+
+def test_library_on_binary_snapshot(tmp_path):
+    # Тестирование библиотеки на двоичном снимке: книги создаются при обращении, изменения пишутся в журнал.
+    filename = str(tmp_path / "library.lbs")
+    with open(filename, 'wb') as file:
+        write_binary_snapshot(file, (Book(**book) for book in sample_books))
+    library = Library(filename, journal=True)
+    assert isinstance(library._books, SnapshotBooks) and not library._books._overlay
+    assert library.get_book("9acfe847-1910-4d20-b0f4-b8fbb384b942").year == "1990"
+    assert len(library._books._overlay) == 1  # Создана только запрошенная книга.
+
+    library.add_book("4", "Book 4", "Author 4", "2024")
+    library.remove_book("83d80f3f-874e-4150-91ed-aa7986b5f7cd")
+    library.update_status("1eea1a99-410a-4524-b374-b2c9f1b04a16", "Выдана")
+    expected = [
+        ("1eea1a99-410a-4524-b374-b2c9f1b04a16", "Выдана"),
+        ("9acfe847-1910-4d20-b0f4-b8fbb384b942", "В наличии"),
+        ("4", "В наличии"),
+    ]
+    for _ in range(2):
+        # Изменения видны в новом сеансе: сначала из журнала, затем из нового снимка после сжатия.
+        library.close()
+        library = Library(filename, journal=True)
+        assert [(book.book_id, book.status) for book in library.iter_books()] == expected
+        assert [book.book_id for book in library.books_by_year(1990, 2024)] == [
+            "9acfe847-1910-4d20-b0f4-b8fbb384b942", "4"]
+        library.save_books()
+    library.close()
+
+
+@pytest.mark.parametrize("journal", [False, True])
+def test_columnar_library_on_binary_snapshot(tmp_path, journal):
+    # Тестирование хранения по столбцам для библиотеки на двоичном снимке.
+    filename = str(tmp_path / "library.lbs")
+    with open(filename, 'wb') as file:
+        write_binary_snapshot(file, (Book(**book) for book in sample_books))
+    library = Library(filename, journal=journal, columnar=True)
+    assert isinstance(library._books, BookTable)
+    assert [book.to_dict() for book in library.iter_books()] == sample_books
+    library.update_status("1eea1a99-410a-4524-b374-b2c9f1b04a16", "Выдана")
+    library.close()
+    assert Library(filename, journal=journal).get_book("1eea1a99-410a-4524-b374-b2c9f1b04a16").status == "Выдана"
+
+
+@pytest.mark.parametrize("kind", ["json", "columnar", "sqlite"])
+def test_status_index(tmp_path, kind):
+    # Тестирование индекса статусов: счётчики и списки книг обновляются при каждом изменении.
+    if kind == "sqlite":
+        library = Library(str(tmp_path / "library.db"), backend="sqlite")
+    else:
+        library = Library(str(tmp_path / "library.json"), journal=True, columnar=kind == "columnar")
+    library.books = [Book(**book) for book in sample_books]
+    assert library.status_counts() == {"В наличии": 3}
+    library.update_status("1eea1a99-410a-4524-b374-b2c9f1b04a16", "Выдана")
+    library.add_book("4", "Book 4", "Author 4", "2024", "Выдана")
+    library.remove_book("83d80f3f-874e-4150-91ed-aa7986b5f7cd")
+    library.update_statuses({"4": "Списана"})
+    assert library.status_counts() == {"В наличии": 1, "Выдана": 1, "Списана": 1}
+    assert [book.book_id for book in library.available_books()] == ["9acfe847-1910-4d20-b0f4-b8fbb384b942"]
+    assert [book.book_id for book in library.issued_books()] == ["1eea1a99-410a-4524-b374-b2c9f1b04a16"]
+    library.close()
+
+
+def test_status_index_on_binary_snapshot(tmp_path):
+    # Тестирование индекса статусов на двоичном снимке: индекс строится при первом запросе с учётом журнала.
+    filename = str(tmp_path / "library.lbs")
+    with open(filename, 'wb') as file:
+        write_binary_snapshot(file, (Book(**book) for book in sample_books))
+    library = Library(filename, journal=True)
+    library.update_status("9acfe847-1910-4d20-b0f4-b8fbb384b942", "Выдана")
+    assert library.status_counts() == {"В наличии": 2, "Выдана": 1}
+    library.add_book("9acfe847-1910-4d20-b0f4-b8fbb384b942", "Book 3", "Author 3", "2024")  # Замена книги.
+    assert library.status_counts() == {"В наличии": 3}
+    assert library.issued_books() == []
+    library.close()
+
+
+def test_metrics(tmp_path):
+    # Тестирование метрик: вызовы, записанные байты, просмотренные книги и запись снимков в JSONL файл.
+    filename = str(tmp_path / "library.json")
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump(sample_books, file, ensure_ascii=False)
+    library = Library(filename, lazy=True)
+    assert library.metrics() is None
+    dump_filename = str(tmp_path / "metrics.jsonl")
+    library.enable_metrics(dump_filename, dump_interval=0)
+    library.add_book("4", "Book 4", "Author 4", "2024")
+    library.search('title', 'направленн')
+    library.search('title', 'направленн')  # Результат из кэша: книги не просматриваются.
+    metrics = library.metrics()
+    assert metrics['methods']['add_book']['calls'] == 1
+    assert metrics['methods']['add_book']['bytes_written'] == os.path.getsize(filename + '.journal')
+    assert metrics['methods']['search']['calls'] == 2
+    assert metrics['methods']['search']['books_scanned'] == 4  # Поиск в ленивом режиме читает весь файл.
+    assert metrics['cache']['hits'] == 1
+
+    library.disable_metrics()
+    assert 'search' not in vars(library) and library.metrics() is None
+    with open(dump_filename, 'r', encoding='utf-8') as file:
+        snapshots = [json.loads(line) for line in file]
+    assert len(snapshots) > 1  # При нулевом интервале снимок пишется после каждого вызова и при выключении.
+    assert snapshots[-1]['methods'] == metrics['methods']
+
+
+def test_trigram_index_and_bounded_levenshtein():
+    # Тестирование подбора похожих слов: расстояние не больше допустимого, лучшие совпадения первыми.
+    assert bounded_levenshtein("толстой", "толстый", 1) == 1
+    assert bounded_levenshtein("толстой", "толсто", 2) == 1
+    assert bounded_levenshtein("толстой", "тостый", 1) is None
+    index = TrigramIndex(["толстой", "толстый", "толстова", "пушкин"])
+    assert [word for distance, similarity, word in index.match("толстй", 2)] == ["толстой", "толстый"]
+    index.discard("толстой")
+    assert [word for distance, similarity, word in index.match("толстй", 1)] == ["толстый"]
+
+
+@pytest.mark.parametrize("kind", ["json", "lazy", "sqlite"])
+def test_fuzzy_search(monkeypatch, tmp_path, kind):
+    # Тестирование поиска с опечатками: результаты упорядочены по числу опечаток, индекс следит за изменениями.
+    if kind == "sqlite":
+        library = Library(str(tmp_path / "library.db"), backend="sqlite")
+        library.books = [Book(**book) for book in sample_books]
+    else:
+        filename = str(tmp_path / "library.json")
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(sample_books, file, ensure_ascii=False)
+        library = Library(filename, lazy=True) if kind == "lazy" else Library(filename)
+    assert [book.author for book in library.fuzzy_search('author', 'Беляокв')] == ["Архип Георгиевич Беляков"]
+    assert [book.title for book in library.fuzzy_search('title', 'направленая координацыя')] == [
+        "Органичная и направленная координация"]
+    library.add_book("4", "Book 4", "Иван Белякова", "2024")
+    library.add_book("5", "Book 5", "Иван Беляков", "2024")
+    # Книга с точным совпадением идёт первой, книга с одной опечаткой - после неё.
+    assert [book.book_id for book in library.fuzzy_search('author', 'беляков иван')] == ["5", "4"]
+    # Книги с одинаковой оценкой идут в порядке каталога.
+    assert [book.book_id for book in library.fuzzy_search('author', 'беляков')] == [
+        "83d80f3f-874e-4150-91ed-aa7986b5f7cd", "5", "4"]
+    assert [book.book_id for book in library.fuzzy_search('author', 'беляков', limit=1)] == [
+        "83d80f3f-874e-4150-91ed-aa7986b5f7cd"]
+    library.remove_book("5")
+    assert [book.book_id for book in library.fuzzy_search('author', 'беляков иван')] == ["4"]
+    assert library.fuzzy_search('author', 'Толстой') == []
+
+    answers = iter(['4', '2', 'Беляоква'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    assert [book.book_id for book in library.find_book()] == ["4"]
+    library.close()
+
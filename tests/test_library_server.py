@@ -0,0 +1,124 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+from library_manage import Library
+from library_server import LibraryServer, request
+
+
+# Функция для запуска сервиса на свободном порту, выполнения сценария клиента и остановки сервиса.
+def run_with_server(library, scenario):
+    async def main():
+        server = LibraryServer(library)
+        port = (await server.start('127.0.0.1', 0)).sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            return await scenario(server, reader, writer, port)
+        finally:
+            writer.close()
+            await server.close()
+    return asyncio.run(main())
+
+
+def test_server_crud(tmp_path):
+    # Тестирование всех операций сервиса по одному соединению.
+    library = Library(str(tmp_path / "library.json"), journal=True)
+
+    async def scenario(server, reader, writer, port):
+        status, book = await request(reader, writer, 'POST', '/books',
+                                     {'book_id': '1', 'title': 'Ёжик в тумане', 'author': 'Сергей Козлов', 'year': '1969'})
+        assert status == 201 and book['status'] == "В наличии" and book['version'] == 1
+        assert (await request(reader, writer, 'POST', '/books', {'book_id': '1', 'title': 'A', 'author': 'B', 'year': '2000'}))[0] == 409
+        assert (await request(reader, writer, 'POST', '/books', {'title': 'Без автора'}))[0] == 400
+
+        status, found = await request(reader, writer, 'GET', '/search?field=title&q=' + 'ежик')
+        assert status == 200 and [book['book_id'] for book in found['books']] == ['1']
+        status, found = await request(reader, writer, 'GET', '/search?field=author&q=' + 'казлов&fuzzy=1')
+        assert status == 200 and [book['book_id'] for book in found['books']] == ['1']
+        status, found = await request(reader, writer, 'GET', '/search?field=year&q=1960-1970')
+        assert [book['book_id'] for book in found['books']] == ['1']
+        status, page = await request(reader, writer, 'GET', '/books?page=1&page_size=10')
+        assert status == 200 and len(page['books']) == 1
+
+        status, book = await request(reader, writer, 'PUT', '/books/1/status', {'status': 'Выдана', 'version': 1})
+        assert status == 200 and book['status'] == 'Выдана' and book['version'] == 2
+        # Версия должна быть целым числом, как и в параметре version при удалении.
+        assert (await request(reader, writer, 'PUT', '/books/1/status', {'status': 'Списана', 'version': '2'}))[0] == 400
+        assert (await request(reader, writer, 'PUT', '/books/1/status', {'status': 'Списана', 'version': True}))[0] == 400
+        # Изменение по устаревшей версии отклоняется.
+        assert (await request(reader, writer, 'PUT', '/books/1/status', {'status': 'Списана', 'version': 1}))[0] == 409
+        assert (await request(reader, writer, 'DELETE', '/books/1?version=1'))[0] == 409
+        assert (await request(reader, writer, 'DELETE', '/books/1?version=2'))[0] == 200
+        assert (await request(reader, writer, 'GET', '/books/1'))[0] == 404
+        assert (await request(reader, writer, 'GET', '/unknown'))[0] == 404
+        assert (await request(reader, writer, 'DELETE', '/books'))[0] == 405
+
+    run_with_server(library, scenario)
+    library.close()
+    with open(library.journal_filename, 'r', encoding='utf-8') as file:
+        assert [json.loads(line)['op'] for line in file] == ['add', 'status', 'remove']
+
+
+def test_server_group_commit(monkeypatch, tmp_path):
+    # Тестирование того, что одновременные изменения от разных клиентов сохраняются одной записью на диск.
+    library = Library(str(tmp_path / "library.json"), journal=True)
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (fsyncs.append(fd), real_fsync(fd)))
+
+    async def scenario(server, reader, writer, port):
+        async def client(number):
+            client_reader, client_writer = await asyncio.open_connection('127.0.0.1', port)
+            status, _ = await request(client_reader, client_writer, 'POST', '/books',
+                                      {'book_id': str(number), 'title': f'Book {number}', 'author': 'Author', 'year': '2000'})
+            client_writer.close()
+            return status
+        return await asyncio.gather(*(client(number) for number in range(20)))
+
+    assert run_with_server(library, scenario) == [201] * 20
+    assert len(library) == 20
+    assert len(fsyncs) < 20  # Изменения объединены в группы.
+    assert len(Library(library.filename, journal=True)) == 20
+    library.close()
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_server_reads_during_commit(tmp_path, backend):
+    # Тестирование того, что во время сохранения группы изменений сервис отвечает на чтения.
+    if backend == "json":
+        library = Library(str(tmp_path / "library.json"), journal=True)
+    else:
+        library = Library(str(tmp_path / "library.db"), backend="sqlite")
+    library.add_books([{'book_id': '1', 'title': 'Title', 'author': 'Author', 'year': '2000'}])
+    writing, release = threading.Event(), threading.Event()
+    write_records = library._write_records
+
+    # Запись на диск не завершается, пока тест не прочитает книгу.
+    def slow_write_records(records):
+        writing.set()
+        release.wait(5)
+        write_records(records)
+    library._write_records = slow_write_records
+
+    async def scenario(server, reader, writer, port):
+        add = asyncio.create_task(request(reader, writer, 'POST', '/books',
+                                          {'book_id': '2', 'title': 'New', 'author': 'Author', 'year': '2001'}))
+        assert await asyncio.to_thread(writing.wait, 5)
+        read_reader, read_writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            status, book = await asyncio.wait_for(request(read_reader, read_writer, 'GET', '/books/1'), 5)
+            assert status == 200 and book['title'] == 'Title'
+            assert not add.done()
+        finally:
+            release.set()
+            read_writer.close()
+        return (await add)[0]
+
+    assert run_with_server(library, scenario) == 201
+    library.close()
+    reopened = Library(library.filename, journal=True) if backend == "json" else Library(library.filename, backend="sqlite")
+    assert reopened.get_book('2') is not None
+    reopened.close()